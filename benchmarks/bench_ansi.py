@@ -0,0 +1,117 @@
+"""Micro-benchmark for the console's ANSI escape parsing.
+
+Feeds console lines through AnsiSgrParser and through the per-line parser
+append_output used before it (dict rebuilt, regexes compiled and text
+concatenated on every call) and reports lines/s for each.
+
+    python benchmarks/bench_ansi.py [--lines 200000] [--input captured_output.txt]
+
+--input replays a file of captured distro output (for example start_env
+redirected to a file with colors on) instead of the built-in sample lines.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chim_console import AnsiSgrParser
+
+SAMPLE_LINES = [
+    "Starting Apache httpd web server: apache2.\n",
+    "\x1b[32m[OK]\x1b[0m HerikaServer is ready\n",
+    "\x1b[1;33mWARNING:\x1b[0m model cache miss, downloading https://huggingface.co/some/model\n",
+    "\x1b[38;5;244m2024-05-01 12:00:00\x1b[0m \x1b[1;32mINFO\x1b[0m     Uvicorn running on http://0.0.0.0:8020\n",
+    "\x1b[38;2;255;99;71merror\x1b[39m: connection refused\x1b[K\n",
+    "remote: Counting objects: 100% (42/42), done.\n",
+]
+
+LEGACY_ANSI_TO_TAG = {
+    '0': None, '1': 'bold', '2': None, '3': None, '4': None, '22': None,
+    '30': 'black', '31': 'red', '32': 'green', '33': 'yellow', '34': 'blue', '35': 'purple',
+    '36': 'cyan', '37': 'white', '39': None, '90': 'gray', '91': 'bright_red', '92': 'bright_green',
+    '93': 'bright_yellow', '94': 'bright_blue', '95': 'bright_purple', '96': 'bright_cyan',
+    '97': 'bright_white', '1;30': 'bold_black', '1;31': 'bold_red', '1;32': 'bold_green',
+    '1;33': 'bold_yellow', '1;34': 'bold_blue', '1;35': 'bold_purple', '1;36': 'bold_cyan',
+    '1;37': 'bold_white', '1;90': 'bold_gray', '1;91': 'bold_bright_red', '1;92': 'bold_bright_green',
+    '1;93': 'bold_bright_yellow', '1;94': 'bold_bright_blue', '1;95': 'bold_bright_purple',
+    '1;96': 'bold_bright_cyan', '1;97': 'bold_bright_white',
+}
+
+
+def legacy_process_ansi(text):
+    """The per-line parser the launcher used before AnsiSgrParser (minus its Tk tag setup)."""
+    ansi_color_pattern = re.compile(r'\x1B\[((?:\d+;)*\d+)m')
+    ansi_to_tag = dict(LEGACY_ANSI_TO_TAG)  # rebuilt on every call, as the original was
+    cleaned_text = ""
+    color_tags = []
+    current_tag = None
+    segments = ansi_color_pattern.split(text)
+    for i, segment in enumerate(segments):
+        if i % 2 == 0:
+            start_pos = len(cleaned_text)
+            cleaned_text += segment
+            if current_tag is not None and segment:
+                color_tags.append((start_pos, len(cleaned_text), current_tag))
+        elif ';' in segment:
+            if segment in ansi_to_tag:
+                current_tag = ansi_to_tag[segment]
+            else:
+                codes = segment.split(';')
+                if '1' in codes:
+                    for code in codes:
+                        if f"1;{code}" in ansi_to_tag:
+                            current_tag = ansi_to_tag[f"1;{code}"]
+                            break
+                else:
+                    for code in reversed(codes):
+                        if code in ansi_to_tag:
+                            current_tag = ansi_to_tag[code]
+                            break
+        elif segment == '0':
+            current_tag = None
+        else:
+            current_tag = ansi_to_tag.get(segment, current_tag)
+    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+    cleaned_text = ansi_escape.sub('', cleaned_text)
+    return cleaned_text, color_tags
+
+
+def run_once(parse, lines):
+    start = time.perf_counter()
+    for line in lines:
+        parse(line)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark console ANSI parsing")
+    parser.add_argument("--lines", type=int, default=200000, help="Lines to parse per run")
+    parser.add_argument("--input", help="File of captured console output to replay instead of the samples")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    source = SAMPLE_LINES
+    if args.input:
+        with open(args.input, encoding="utf-8", errors="replace") as captured:
+            source = captured.readlines() or SAMPLE_LINES
+    lines = [source[i % len(source)] for i in range(args.lines)]
+
+    variants = [
+        ("legacy per-line parser", legacy_process_ansi),
+        ("AnsiSgrParser.feed", AnsiSgrParser().feed),
+    ]
+    results = {}
+    for name, parse in variants:
+        best = min(run_once(parse, lines) for _ in range(args.runs))
+        results[name] = args.lines / best
+        print(f"{name:<24} {results[name]:12.0f} lines/s")
+
+    baseline, candidate = results.values()
+    print(f"speedup: {candidate / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Memory and throughput benchmark for the launcher's output console.
+
+Streams --lines console lines (plain, ANSI-colored and with URLs, like
+start_env and update output) through the launcher's append_output queue and
+batch writer into a real Tk Text widget, with the scrollback limit applied.
+The window stays withdrawn, but Tk still needs a display (any Windows desktop).
+
+    python benchmarks/bench_console.py [--lines 1000000] [--max-lines 20000] [--max-chars 0]
+
+Reports lines/s, the lines, Tk tags and links left in the widget and RSS
+before and after, so unbounded growth shows up as RSS that keeps climbing
+with --lines.
+"""
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_proxy import current_rss
+from chim_console import AnsiSgrParser, ConsoleOutput, LineFilter, OUTPUT_MAX_LINES_PER_FLUSH
+
+SAMPLE_LINES = [
+    "Starting Apache httpd web server: apache2.\n",
+    "\x1b[32m[OK]\x1b[0m HerikaServer is ready\n",
+    "Open http://127.0.0.1:8081/HerikaServer/ui/index.php to configure\n",
+    "\x1b[1;33mWARNING:\x1b[0m model cache miss, downloading https://huggingface.co/some/model\n",
+    "remote: Counting objects: 100% (42/42), done.\n",
+]
+
+
+class ConsoleHarness(ConsoleOutput):
+    """The launcher's console methods on a bare Text widget, without the rest of the window."""
+    def __init__(self, root, max_lines, max_chars):
+        self.options = argparse.Namespace(console_max_lines=max_lines, console_max_chars=max_chars)
+        self.output_area = tk.Text(root, font=("Consolas", 10), wrap=tk.WORD)
+        self.output_area.pack()
+        self.output_area.tag_config('green', foreground='lime green')
+        self.output_area.tag_config('red', foreground='red')
+        self.output_area.tag_config("link", foreground="#6495ED", underline=True)
+        self.output_area.config(state=tk.DISABLED)
+        self.line_filter = LineFilter()
+        self.output_queue = deque()
+        self.output_stats = {"lines": 0, "flushes": 0, "largest_batch": 0, "trimmed_lines": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the launcher output console")
+    parser.add_argument("--lines", type=int, default=1000000, help="Lines to stream")
+    parser.add_argument("--max-lines", type=int, default=20000, help="Scrollback limit in lines (0 = unlimited)")
+    parser.add_argument("--max-chars", type=int, default=0, help="Scrollback limit in characters (0 = unlimited)")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.withdraw()
+    console = ConsoleHarness(root, args.max_lines, args.max_chars)
+    rss_before = current_rss()
+
+    start = time.perf_counter()
+    ansi = AnsiSgrParser()  # one stream, as with start_env output
+    sent = 0
+    while sent < args.lines:
+        # One timer tick's worth of lines, then the batch write the 33 ms timer would do
+        batch = min(OUTPUT_MAX_LINES_PER_FLUSH, args.lines - sent)
+        for i in range(sent, sent + batch):
+            console.append_output(SAMPLE_LINES[i % len(SAMPLE_LINES)], ansi=ansi)
+        console.write_output_batch()
+        root.update_idletasks()
+        sent += batch
+    elapsed = time.perf_counter() - start
+    rss_after = current_rss()
+
+    widget_lines = int(console.output_area.index("end-1c").split(".")[0])
+    links = len(console.output_area.tag_ranges("link")) // 2
+    last_link = console.output_area.tag_prevrange("link", "end")
+    print(f"lines:          {args.lines:10d}")
+    print(f"elapsed:        {elapsed:10.2f} s")
+    print(f"lines/s:        {args.lines / elapsed:10.0f}")
+    print(f"flushes:        {console.output_stats['flushes']:10d}")
+    print(f"trimmed lines:  {console.output_stats['trimmed_lines']:10d}")
+    print(f"widget lines:   {widget_lines:10d}")
+    print(f"Tk tags:        {len(console.output_area.tag_names()):10d}")
+    print(f"links:          {links:10d} (last: {console.link_url_at(last_link[0]) if last_link else None})")
+    if rss_before is not None and rss_after is not None:
+        print(f"RSS:            {rss_before / (1024 * 1024):10.1f} MB -> {rss_after / (1024 * 1024):.1f} MB")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Micro-benchmark for the console's unwanted-line filter.
+
+Runs console lines through LineFilter.match and through the loop of ten
+re.match calls is_unwanted_line used before it, checks that both drop the
+same lines, and reports lines/s for each.
+
+    python benchmarks/bench_line_filter.py [--lines 500000] [--input captured_output.txt]
+
+--input replays a file of captured distro output instead of the built-in
+sample lines.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chim_console import LineFilter
+
+SAMPLE_LINES = [
+    "Starting Apache httpd web server: apache2.\n",
+    "[OK] HerikaServer is ready\n",
+    "Open http://127.0.0.1:8081/HerikaServer/ui/index.php to configure\n",
+    "INFO:     Uvicorn running on http://0.0.0.0:8020 (Press CTRL+C to quit)\n",
+    "remote: Counting objects: 100% (42/42), done.\n",
+    "2024-05-01 12:00:00 [chim] loaded 1532 memories for Lydia\n",
+    "\n",
+    "______________________________________________\n",
+    "==============================================\n",
+    "Press Enter to shutdown DwemerDistro\n",
+]
+
+LEGACY_PATTERNS = [
+    r'^[\s_¯]+$',
+    r'^_+$',
+    r'^¯+$',
+    r'^=+$',
+    r'^\s*$',
+    r'^(__|¯¯){3,}$',
+    r'^(\s*_{5,}\s*)+$',
+    r'^(\s*¯{5,}\s*)+$',
+    r'^.*¯Â.*$',
+    r'^.*Press Enter to shutdown DwemerDistro.*$',
+]
+
+
+def legacy_is_unwanted_line(text):
+    """The filter is_unwanted_line used before LineFilter."""
+    for pattern in LEGACY_PATTERNS:
+        if re.match(pattern, text):
+            return True
+    return False
+
+
+def run_once(is_unwanted, lines):
+    start = time.perf_counter()
+    dropped = 0
+    for line in lines:
+        if is_unwanted(line):
+            dropped += 1
+    return time.perf_counter() - start, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the console unwanted-line filter")
+    parser.add_argument("--lines", type=int, default=500000, help="Lines to check per run")
+    parser.add_argument("--input", help="File of captured console output to replay instead of the samples")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    source = SAMPLE_LINES
+    if args.input:
+        with open(args.input, encoding="utf-8", errors="replace") as captured:
+            source = captured.readlines() or SAMPLE_LINES
+    lines = [source[i % len(source)] for i in range(args.lines)]
+
+    line_filter = LineFilter()
+    variants = [
+        ("legacy re.match loop", legacy_is_unwanted_line),
+        ("LineFilter.match", lambda text: line_filter.match(text) is not None),
+    ]
+    results = {}
+    dropped_counts = {}
+    for name, is_unwanted in variants:
+        timings = [run_once(is_unwanted, lines) for _ in range(args.runs)]
+        results[name] = args.lines / min(elapsed for elapsed, _ in timings)
+        dropped_counts[name] = timings[0][1]
+        print(f"{name:<24} {results[name]:12.0f} lines/s  ({dropped_counts[name]} dropped)")
+
+    baseline, candidate = results.values()
+    print(f"speedup: {candidate / baseline:.2f}x")
+    if len(set(dropped_counts.values())) != 1:
+        print("WARNING: the filters disagree on which lines to drop")
+    print(f"hits by rule: {line_filter.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""End-to-end benchmark for the 7513 proxy against a local fake upstream.
+
+Starts a proxy engine on an ephemeral port with a stubbed target_addr_func that
+points at an in-process HTTP server standing in for HerikaServer (no WSL, no Tk
+root). N concurrent clients then run one of two workloads:
+
+  request  each client sends small HTTP requests, one connection per request
+           unless --keep-alive is given (the game opens a connection per call)
+  stream   each client downloads a bulk response of --stream-megabytes
+
+    python benchmarks/bench_proxy.py [--engine thread|asyncio] [--http-pool]
+        [--workload request|stream] [--clients 16] [--requests 200]
+
+Reports connections/s, requests/s, throughput, client-side latency
+percentiles, peak thread count and peak RSS.
+"""
+import argparse
+import http.server
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chim_services import PROXY_ENGINES, ProxyMetrics, UpstreamConnectionPool, _latency_percentiles
+
+RESPONSE_BODY = b'{"status":"ok","text":"' + b"x" * 512 + b'"}'
+STREAM_CHUNK = os.urandom(64 * 1024)
+
+
+class FakeUpstreamServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 turns bursts into SYN retries
+
+
+class FakeUpstreamHandler(http.server.BaseHTTPRequestHandler):
+    """Answers GET /stream/<bytes> with a bulk body and anything else with a small JSON body."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def do_GET(self):
+        if self.path.startswith("/stream/"):
+            remaining = int(self.path.rsplit("/", 1)[1])
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(remaining))
+            self.end_headers()
+            while remaining > 0:
+                chunk = STREAM_CHUNK[:min(len(STREAM_CHUNK), remaining)]
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietLogger:
+    """Logger for the proxy under test; prints only with --verbose."""
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def append_output(self, text, tag=None):
+        if self.verbose:
+            sys.stdout.write(text)
+
+
+class ResourceSampler(threading.Thread):
+    """Samples thread count and RSS while the benchmark runs."""
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.peak_threads = threading.active_count()
+        self.peak_rss = current_rss()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            rss = current_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+def current_rss():
+    """Resident set size in bytes, or None where it cannot be read without extra packages."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    except (ImportError, AttributeError, OSError):
+        pass
+    return None
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def read_response(sock, sink):
+    """Read one HTTP response with a Content-Length body; returns body bytes received."""
+    head = b""
+    while b"\r\n\r\n" not in head:
+        data = sock.recv(4096)
+        if not data:
+            raise ConnectionError("proxy closed the connection mid-response")
+        head += data
+    head, _, body_start = head.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value.strip())
+    received = len(body_start)
+    while received < length:
+        count = sock.recv_into(sink)
+        if not count:
+            raise ConnectionError("proxy closed the connection mid-body")
+        received += count
+    return received
+
+
+def run_client(proxy_port, path, count, keep_alive, results):
+    sink = bytearray(256 * 1024)
+    sock = None
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            if sock is None:
+                sock = socket.create_connection(("127.0.0.1", proxy_port))
+                results["connections"] += 1
+            connection = "keep-alive" if keep_alive else "close"
+            sock.sendall(
+                f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: {connection}\r\n\r\n".encode("ascii")
+            )
+            results["bytes"] += read_response(sock, sink)
+            results["latencies"].append((time.perf_counter() - start) * 1000)
+            results["requests"] += 1
+            if not keep_alive:
+                sock.close()
+                sock = None
+    except (OSError, ConnectionError) as e:
+        results["errors"].append(str(e))
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the launcher proxy against a local fake upstream")
+    parser.add_argument("--engine", choices=sorted(PROXY_ENGINES), default="thread")
+    parser.add_argument("--http-pool", action="store_true", help="Use pooled keep-alive upstream sockets (thread engine)")
+    parser.add_argument("--workload", choices=["request", "stream"], default="request")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client (request workload)")
+    parser.add_argument("--keep-alive", action="store_true", help="Reuse each client connection across requests")
+    parser.add_argument("--stream-megabytes", type=int, default=64, help="Download size per client (stream workload)")
+    parser.add_argument("--max-connections", type=int, default=32, help="Proxy admission limit")
+    parser.add_argument("--verbose", action="store_true", help="Print proxy log output")
+    args = parser.parse_args()
+
+    upstream = FakeUpstreamServer(("127.0.0.1", 0), FakeUpstreamHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_addr = upstream.server_address
+
+    proxy_port = free_port()
+    metrics = ProxyMetrics()
+    proxy_kwargs = {
+        "metrics": metrics,
+        "max_connections": args.max_connections,
+        "accept_queue_depth": args.clients * 2,
+    }
+    if args.http_pool:
+        if args.engine != "thread":
+            parser.error("--http-pool requires --engine thread")
+        proxy_kwargs["upstream_pool"] = UpstreamConnectionPool()
+    proxy = PROXY_ENGINES[args.engine](
+        ("127.0.0.1", proxy_port),
+        lambda: upstream_addr,
+        QuietLogger(args.verbose),
+        **proxy_kwargs
+    )
+    proxy.start()
+    time.sleep(0.2)
+
+    if args.workload == "stream":
+        path, per_client = f"/stream/{args.stream_megabytes * 1024 * 1024}", 1
+    else:
+        path, per_client = "/api/chat", args.requests
+
+    per_thread_results = [
+        {"connections": 0, "requests": 0, "bytes": 0, "latencies": [], "errors": []}
+        for _ in range(args.clients)
+    ]
+    sampler = ResourceSampler()
+    sampler.start()
+    start = time.perf_counter()
+    clients = [
+        threading.Thread(target=run_client, args=(proxy_port, path, per_client, args.keep_alive, results))
+        for results in per_thread_results
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    proxy.shutdown()
+    upstream.shutdown()
+
+    connections = sum(r["connections"] for r in per_thread_results)
+    requests_done = sum(r["requests"] for r in per_thread_results)
+    total_bytes = sum(r["bytes"] for r in per_thread_results)
+    latencies = [ms for r in per_thread_results for ms in r["latencies"]]
+    errors = [e for r in per_thread_results for e in r["errors"]]
+    percentiles = _latency_percentiles(latencies)
+    snapshot = metrics.snapshot()
+
+    pool_text = " +http-pool" if args.http_pool else ""
+    print(f"engine: {args.engine}{pool_text}  workload: {args.workload}  clients: {args.clients}")
+    print(f"elapsed:        {elapsed:10.2f} s")
+    print(f"connections/s:  {connections / elapsed:10.1f}")
+    print(f"requests/s:     {requests_done / elapsed:10.1f}")
+    print(f"throughput:     {total_bytes / elapsed / (1024 * 1024):10.1f} MB/s")
+    print(f"latency ms:     p50 {percentiles['p50']}  p95 {percentiles['p95']}  p99 {percentiles['p99']}")
+    print(f"peak threads:   {sampler.peak_threads:10d}")
+    if sampler.peak_rss is not None:
+        print(f"peak RSS:       {sampler.peak_rss / (1024 * 1024):10.1f} MB")
+    print(f"proxy metrics:  rejected {snapshot['rejected']}  queued {snapshot['queued']}  "
+          f"ttfb p50 {snapshot['latency_ms']['ttfb']['p50']} ms")
+    if errors:
+        print(f"errors:         {len(errors)} (first: {errors[0]})")
+
+
+if __name__ == "__main__":
+    main()
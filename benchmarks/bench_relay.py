@@ -0,0 +1,103 @@
+"""Micro-benchmark for the proxy's raw relay loop.
+
+Streams a bulk payload through relay_sockets() over local socket pairs and
+compares it with the original 4 KB recv()/sendall() loop.
+
+    python benchmarks/bench_relay.py [--megabytes 256] [--chunk-size 65536]
+"""
+import argparse
+import os
+import select
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chim_services import relay_sockets
+
+
+def legacy_relay(sock_a, sock_b, chunk_size=4096, poll_interval=1):
+    """The relay loop SimpleTCPProxy used before recv_into buffers."""
+    sockets = [sock_a, sock_b]
+    while True:
+        rlist, _, _ = select.select(sockets, [], [], poll_interval)
+        if sock_a in rlist:
+            data = sock_a.recv(chunk_size)
+            if not data:
+                return
+            sock_b.sendall(data)
+        if sock_b in rlist:
+            data = sock_b.recv(chunk_size)
+            if not data:
+                return
+            sock_a.sendall(data)
+
+
+def run_once(relay_func, total_bytes, chunk_size):
+    """Push total_bytes producer -> relay -> consumer and return elapsed seconds."""
+    producer, relay_in = socket.socketpair()
+    relay_out, consumer = socket.socketpair()
+    payload = os.urandom(1024 * 1024)
+
+    def produce():
+        sent = 0
+        while sent < total_bytes:
+            chunk = payload[:min(len(payload), total_bytes - sent)]
+            producer.sendall(chunk)
+            sent += len(chunk)
+        producer.shutdown(socket.SHUT_WR)
+
+    def relay():
+        try:
+            relay_func(relay_in, relay_out, chunk_size)
+        finally:
+            relay_out.close()
+            relay_in.close()
+
+    received = 0
+    sink = bytearray(1024 * 1024)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce), threading.Thread(target=relay)]
+    for thread in threads:
+        thread.start()
+    while True:
+        count = consumer.recv_into(sink)
+        if not count:
+            break
+        received += count
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+    producer.close()
+    consumer.close()
+    if received != total_bytes:
+        raise RuntimeError(f"relay dropped data: {received} of {total_bytes} bytes")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the proxy relay loop")
+    parser.add_argument("--megabytes", type=int, default=256, help="Payload size per run")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Buffer size for relay_sockets")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    total_bytes = args.megabytes * 1024 * 1024
+    variants = [
+        ("legacy recv(4096)", legacy_relay, 4096),
+        (f"recv_into({args.chunk_size})", relay_sockets, args.chunk_size),
+    ]
+    results = {}
+    for name, relay_func, chunk_size in variants:
+        best = min(run_once(relay_func, total_bytes, chunk_size) for _ in range(args.runs))
+        results[name] = args.megabytes / best
+        print(f"{name:<24} {results[name]:10.1f} MB/s")
+
+    baseline, candidate = results.values()
+    print(f"speedup: {candidate / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""Output console for the Dwemer Distro launcher: ANSI colors, line filters and scrollback.
+
+Nothing in this module imports Tk, so the parsers and filters can be used and
+benchmarked on their own. ConsoleOutput only calls methods on the Text widget
+it is given.
+"""
+import re
+import threading
+
+OUTPUT_FLUSH_INTERVAL_MS = 33 # Queued console output is drawn in one batch per tick (~30 per second)
+# Most lines drawn per tick. A flood (update_gws, update.sh) waits in the queue instead of
+# freezing the window, so the console tops out at about 2000 * 30 = 60k lines/s.
+OUTPUT_MAX_LINES_PER_FLUSH = 2000
+OUTPUT_TRIM_LINES = 1000 # Scrollback is trimmed this many lines below its limit, so deletes happen in chunks
+URL_PATTERN = re.compile(r'(https?://\S+)')
+
+# Console colors by ANSI tag name. Each also gets a "bold_<name>" tag, and SGR 1 alone is "bold".
+ANSI_TAG_COLORS = {
+    'black': 'black',
+    'red': 'red',
+    'green': 'lime green',
+    'yellow': '#FFD700',        # Gold
+    'blue': '#1E90FF',          # Dodger Blue
+    'purple': '#DA70D6',        # Orchid
+    'cyan': '#00FFFF',
+    'white': 'white',
+    'gray': '#A9A9A9',          # Dark Gray
+    'bright_red': '#FF6347',    # Tomato
+    'bright_green': '#00FF00',  # Lime
+    'bright_yellow': '#FFFF00',
+    'bright_blue': '#00BFFF',   # Deep Sky Blue
+    'bright_purple': '#FF00FF', # Fuchsia
+    'bright_cyan': '#00FFFF',   # Aqua
+    'bright_white': '#FFFFFF',
+}
+ANSI_BASE_COLORS = ['black', 'red', 'green', 'yellow', 'blue', 'purple', 'cyan', 'white'] # SGR 30-37, 256-color 0-7
+ANSI_BRIGHT_COLORS = ['gray', 'bright_red', 'bright_green', 'bright_yellow',
+                      'bright_blue', 'bright_purple', 'bright_cyan', 'bright_white'] # SGR 90-97, 256-color 8-15
+# RGB of each tag, for mapping 256-color and truecolor codes to the nearest tag
+ANSI_TAG_RGB = {
+    'black': (0, 0, 0), 'red': (255, 0, 0), 'green': (50, 205, 50), 'yellow': (255, 215, 0),
+    'blue': (30, 144, 255), 'purple': (218, 112, 214), 'cyan': (0, 255, 255), 'white': (255, 255, 255),
+    'gray': (169, 169, 169), 'bright_red': (255, 99, 71), 'bright_green': (0, 255, 0),
+    'bright_yellow': (255, 255, 0), 'bright_blue': (0, 191, 255), 'bright_purple': (255, 0, 255),
+    'bright_cyan': (0, 255, 255), 'bright_white': (255, 255, 255),
+}
+ANSI_CUBE_LEVELS = (0, 95, 135, 175, 215, 255) # 256-color 16-231 is a 6x6x6 RGB cube
+# CSI sequences (SGR when the final byte is "m"), OSC strings such as window titles (ended by
+# BEL, ST or, when a program never terminates one, the end of the line), character set
+# selections such as ESC ( B from tput sgr0, and other two-byte escapes
+ANSI_ESCAPE_PATTERN = re.compile(
+    r'\x1B(?:\[([0-?]*)[ -/]*([@-~])|\][^\x07\x1B\n]*(?:\x07|\x1B\\|(?=\n))|[ -/]+[0-~]|[@-Z\\^_])'
+)
+# An escape cut off at the end of a chunk; kept until the rest arrives
+ANSI_PARTIAL_ESCAPE_PATTERN = re.compile(r'\x1B(?:\[[0-?]*[ -/]*|\][^\x07\x1B\n]*|[ -/]+)?$')
+ANSI_MAX_PENDING = 256
+ANSI_MAX_TRANSITIONS = 4096 # cap on cached SGR state transitions, shared by all parsers
+
+
+def nearest_ansi_tag(red, green, blue, _cache={}):
+    """Name of the console color tag closest to an RGB color."""
+    key = (red, green, blue)
+    tag = _cache.get(key)
+    if tag is None:
+        tag = min(ANSI_TAG_RGB, key=lambda name: sum((a - b) ** 2 for a, b in zip(ANSI_TAG_RGB[name], key)))
+        _cache[key] = tag
+    return tag
+
+
+def ansi_256_tag(number):
+    """Console color tag for a 256-color palette index."""
+    if number < 8:
+        return ANSI_BASE_COLORS[number]
+    if number < 16:
+        return ANSI_BRIGHT_COLORS[number - 8]
+    if number < 232:
+        number -= 16
+        return nearest_ansi_tag(ANSI_CUBE_LEVELS[number // 36], ANSI_CUBE_LEVELS[number // 6 % 6], ANSI_CUBE_LEVELS[number % 6])
+    level = 8 + (number - 232) * 10
+    return nearest_ansi_tag(level, level, level)
+
+
+class AnsiSgrParser:
+    """Streaming ANSI parser: strips escape sequences and turns SGR styles into console tags.
+
+    Bold and the foreground color persist across feed() calls as they do in a
+    terminal, so use one parser per output stream: a color that spans lines of
+    start_env output stays applied, and does not leak into other output.
+    Background colors, underline and the like are parsed and dropped.
+    """
+    transitions = {} # (SGR params, bold, foreground) -> (bold, foreground, tag); pure, so shared
+
+    def __init__(self):
+        self.bold = False
+        self.foreground = None
+        self.tag = None
+        self.pending = ""
+
+    def feed(self, text):
+        """Return (clean_text, runs), where runs is a list of (text, tag) covering clean_text.
+
+        tag is None where no SGR style is active, so the caller's own tag applies.
+        """
+        if self.pending:
+            text = self.pending + text
+            self.pending = ""
+        if "\x1b" not in text:
+            return text, [(text, self.tag)] if text else []
+
+        # split() gives text, SGR params, final byte, text, ... (params/final are None for non-CSI escapes)
+        parts = ANSI_ESCAPE_PATTERN.split(text)
+        rest = parts[-1]
+        if "\x1b" in rest:
+            partial = ANSI_PARTIAL_ESCAPE_PATTERN.search(rest)
+            if partial:
+                # Hold a cut-off escape for the next chunk; a long one is an unterminated OSC, so drop it
+                if len(partial.group(0)) <= ANSI_MAX_PENDING:
+                    self.pending = partial.group(0)
+                parts[-1] = rest[:partial.start()]
+
+        runs = []
+        transitions = self.transitions
+        for i in range(0, len(parts) - 1, 3):
+            if parts[i]:
+                self.add_run(runs, parts[i])
+            if parts[i + 2] == "m":
+                # The same few SGR sequences repeat all through a log, so transitions are cached
+                key = (parts[i + 1], self.bold, self.foreground)
+                state = transitions.get(key)
+                if state is None:
+                    self.apply_sgr(parts[i + 1])
+                    state = (self.bold, self.foreground, self.tag)
+                    if len(transitions) < ANSI_MAX_TRANSITIONS:
+                        transitions[key] = state
+                self.bold, self.foreground, self.tag = state
+        rest = parts[-1]
+        if rest:
+            self.add_run(runs, rest)
+        if len(runs) == 1:
+            return runs[0][0], runs
+        return "".join([run_text for run_text, _ in runs]), runs
+
+    def add_run(self, runs, text):
+        if runs and runs[-1][1] == self.tag:
+            runs[-1] = (runs[-1][0] + text, self.tag)
+        else:
+            runs.append((text, self.tag))
+
+    def apply_sgr(self, params):
+        codes = params.split(";") if params else ["0"]
+        i = 0
+        while i < len(codes):
+            code = int(codes[i]) if codes[i].isdigit() else 0
+            if code == 0:
+                self.bold = False
+                self.foreground = None
+            elif code == 1:
+                self.bold = True
+            elif code == 22:
+                self.bold = False
+            elif 30 <= code <= 37:
+                self.foreground = ANSI_BASE_COLORS[code - 30]
+            elif 90 <= code <= 97:
+                self.foreground = ANSI_BRIGHT_COLORS[code - 90]
+            elif code == 39:
+                self.foreground = None
+            elif code in (38, 48):
+                # 38;5;N / 38;2;R;G;B set the foreground, 48;... the (ignored) background
+                color, used = self.extended_color(codes[i + 1:])
+                if code == 38 and color:
+                    self.foreground = color
+                i += used
+            i += 1
+
+        if self.foreground:
+            self.tag = f"bold_{self.foreground}" if self.bold else self.foreground
+        else:
+            self.tag = "bold" if self.bold else None
+
+    def extended_color(self, args):
+        """Tag and number of parameters consumed for the arguments after a 38/48 code."""
+        try:
+            if args[0] == "5":
+                return ansi_256_tag(min(int(args[1]), 255)), 2
+            if args[0] == "2":
+                return nearest_ansi_tag(*(min(int(value or 0), 255) for value in args[1:4])), 4
+        except (IndexError, ValueError):
+            pass
+        return None, len(args)
+
+
+# Console lines dropped by append_output. A rule either matches the start of the line
+# like re.match ("pattern") or looks for a literal anywhere in it ("contains").
+# "prefixes" lists what every line a pattern matches starts with; lines starting with
+# none of them skip the regex.
+LINE_FILTER_SPACE = tuple(" \t\n\r\f\v")
+UNWANTED_LINE_RULES = [
+    {"name": "rule_art", "pattern": r"[\s_¯]+$", "prefixes": LINE_FILTER_SPACE + ("_", "¯")}, # Only whitespace, underscores or '¯' characters
+    {"name": "underscores", "pattern": r"_+$", "prefixes": ("_",)},                         # Only underscores
+    {"name": "overlines", "pattern": r"¯+$", "prefixes": ("¯",)},                           # Only '¯' characters
+    {"name": "equals", "pattern": r"=+$", "prefixes": ("=",)},                              # Only equal signs
+    {"name": "blank", "pattern": r"\s*$", "prefixes": LINE_FILTER_SPACE},                   # Empty or whitespace-only
+    {"name": "repeated_pairs", "pattern": r"(__|¯¯){3,}$", "prefixes": ("_", "¯")},         # Repeated '__' or '¯¯'
+    {"name": "underscore_runs", "pattern": r"(\s*_{5,}\s*)+$", "prefixes": LINE_FILTER_SPACE + ("_",)}, # 5 or more underscores
+    {"name": "overline_runs", "pattern": r"(\s*¯{5,}\s*)+$", "prefixes": LINE_FILTER_SPACE + ("¯",)},   # 5 or more '¯' characters
+    {"name": "mojibake", "contains": "¯Â"},                                                 # '¯Â' anywhere
+    {"name": "shutdown_prompt", "contains": "Press Enter to shutdown DwemerDistro"},        # The shutdown message
+]
+
+
+class LineFilter:
+    """Decides which console lines to drop, counting hits per rule.
+
+    The given pattern rules are compiled into one alternation tried once per
+    line, in rule order, before the contains rules, which are plain substring
+    checks. Rules added later with add_rule (--console-filter) are compiled on
+    their own and tried last, so their flags, group names and backreferences
+    work as written.
+    """
+    def __init__(self, rules=UNWANTED_LINE_RULES):
+        self.hits = {rule["name"]: 0 for rule in rules}
+        self.lock = threading.Lock()
+        pattern_rules = [rule for rule in rules if rule.get("pattern") is not None]
+        self.pattern_names = [rule["name"] for rule in pattern_rules]
+        self.pattern = None
+        if pattern_rules:
+            self.pattern = re.compile("|".join(
+                f"(?P<rule{index}>{rule['pattern']})" for index, rule in enumerate(pattern_rules)
+            ))
+        # One rule without prefixes means any line may match, so the prefix check is off
+        self.prefixes = None
+        if all(rule.get("prefixes") for rule in pattern_rules):
+            self.prefixes = tuple(sorted({prefix for rule in pattern_rules for prefix in rule["prefixes"]}))
+        self.literals = [(rule["name"], rule["contains"]) for rule in rules if rule.get("contains") is not None]
+        self.shortest_literal = min((len(literal) for _, literal in self.literals), default=0)
+        self.custom_patterns = [] # (name, compiled pattern) from add_rule
+
+    def add_rule(self, name, pattern):
+        """Drop lines matching pattern (at the start, like re.match); raises ValueError if it is unusable."""
+        if name in self.hits:
+            raise ValueError(f"Line filter rule '{name}' already exists")
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Line filter rule '{name}' has an invalid pattern: {e}") from None
+        with self.lock:
+            self.custom_patterns = self.custom_patterns + [(name, compiled)]
+            self.hits[name] = 0
+
+    def match(self, text):
+        """Name of the first rule that drops text, or None to keep it."""
+        name = None
+        if self.pattern is not None and (
+            self.prefixes is None
+            or not text
+            or text.startswith(self.prefixes)
+            or text[0].isspace() # \s also covers Unicode whitespace
+        ):
+            match = self.pattern.match(text)
+            if match:
+                name = self.pattern_names[int(match.lastgroup[4:])]
+        # Like the old ^.*literal.*$ patterns, literals only match single-line text (a trailing newline is fine)
+        if name is None and self.literals and len(text) >= self.shortest_literal and "\n" not in text[:-1]:
+            for rule_name, literal in self.literals:
+                if literal in text:
+                    name = rule_name
+                    break
+        if name is None:
+            for rule_name, pattern in self.custom_patterns:
+                if pattern.match(text):
+                    name = rule_name
+                    break
+        if name is not None:
+            with self.lock:
+                self.hits[name] += 1
+        return name
+
+    def stats(self):
+        with self.lock:
+            return {name: count for name, count in self.hits.items() if count}
+
+
+class ConsoleOutput:
+    """Console methods for a host that owns a Tk Text widget (the launcher window).
+
+    The host sets output_area (the Text widget), options (with
+    console_max_lines and console_max_chars), line_filter (a LineFilter),
+    output_queue (a deque) and output_stats, and provides after() to run
+    flush_output on its Tk thread.
+    """
+    def append_output(self, text, tag=None, ansi=None):
+        """Queue text for the console; safe to call from any thread.
+
+        ansi is the AnsiSgrParser of the process stream text comes from, so
+        colors carry over between its lines. Without one, text is parsed on its own.
+        """
+        # Strip ANSI escape sequences, keeping their colors as (text, tag) runs
+        processed_text, ansi_runs = (ansi or AnsiSgrParser()).feed(text)
+
+        # Check if the cleaned text matches unwanted patterns
+        if self.is_unwanted_line(processed_text):
+            return  # Skip appending this line
+
+        # Colored runs take their ANSI tag, the rest the given tag
+        runs = [(run_text, color or tag) for run_text, color in ansi_runs]
+
+        # deque.append is atomic, so producers never wait on the Tk thread
+        self.output_queue.append(runs)
+
+    def is_unwanted_line(self, text):
+        return self.line_filter.match(text) is not None
+
+    def flush_output(self):
+        """Draw queued console output, then re-arm the timer (runs on the Tk thread)."""
+        try:
+            self.write_output_batch()
+        except Exception as e:
+            print(f"Error writing console output: {e}")
+        finally:
+            self.after(OUTPUT_FLUSH_INTERVAL_MS, self.flush_output)
+
+    def write_output_batch(self):
+        """Insert up to OUTPUT_MAX_LINES_PER_FLUSH queued lines with a single insert and a single see."""
+        if not self.output_queue:
+            return
+
+        # Merge neighbouring runs that share a tag, across lines
+        merged = []
+        lines = 0
+        while self.output_queue and lines < OUTPUT_MAX_LINES_PER_FLUSH:
+            for text, tag in self.output_queue.popleft():
+                if merged and merged[-1][1] == tag:
+                    merged[-1][0].append(text)
+                else:
+                    merged.append(([text], tag))
+            lines += 1
+
+        # Text.insert takes chars, tags, chars, tags, ... so the whole batch is one call
+        insert_args = []
+        for texts, tag in merged:
+            self._add_runs_with_url_detection("".join(texts), tag, insert_args)
+
+        self.output_area.config(state="normal")
+        if insert_args:
+            self.output_area.insert("end", *insert_args)
+        self.trim_output()
+        self.output_area.see("end")
+        self.output_area.config(state="disabled")
+
+        self.output_stats["lines"] += lines
+        self.output_stats["flushes"] += 1
+        self.output_stats["largest_batch"] = max(self.output_stats["largest_batch"], lines)
+
+    def trim_output(self):
+        """Delete the oldest console lines once the scrollback is over its line or character limit.
+
+        Trims OUTPUT_TRIM_LINES past the limit so deletes come in chunks rather
+        than on every flush. Links need no cleanup: their "link" tag ranges go
+        with the deleted text.
+        """
+        max_lines = self.options.console_max_lines
+        max_chars = self.options.console_max_chars
+        line_count = int(self.output_area.index("end-1c").split(".")[0])
+        cut_line = 0
+        if max_lines and line_count > max_lines:
+            cut_line = line_count - max_lines + OUTPUT_TRIM_LINES
+        if max_chars:
+            char_count = (self.output_area.count("1.0", "end", "chars") or (0,))[0]
+            if char_count > max_chars:
+                # Cut at the end of the line that holds the limit, plus the chunk
+                over = self.output_area.index(f"1.0 + {char_count - max_chars} chars")
+                cut_line = max(cut_line, int(over.split(".")[0]) + OUTPUT_TRIM_LINES)
+        if not cut_line:
+            return
+
+        cut_line = min(cut_line, line_count)
+        self.output_area.delete("1.0", f"{cut_line + 1}.0")
+        self.output_stats["trimmed_lines"] += cut_line
+
+    def _add_runs_with_url_detection(self, text, tag, insert_args):
+        """Append chars/tags pairs for text to insert_args, with URLs under the shared "link" tag."""
+        base_tags = (tag,) if tag else ()
+        last_end = 0
+
+        for match in URL_PATTERN.finditer(text):
+            start, end = match.span()
+            url = match.group(0)
+
+            # Text before the link
+            if start > last_end:
+                insert_args.extend((text[last_end:start], base_tags))
+
+            # The link text carries the shared link tag and the original tag (if any)
+            insert_args.extend((url, ("link",) + base_tags))
+
+            last_end = end
+
+        # Any remaining text after the last link (or the whole text if no links)
+        if last_end < len(text):
+            insert_args.extend((text[last_end:], base_tags))
+
+    def link_url_at(self, index):
+        """URL of the link covering a text index, looked up in the "link" tag's ranges, or None.
+
+        Links from separate inserts can touch and share one "link" range, so the
+        URL ends at whitespace or where another tag starts or stops (a run boundary).
+        """
+        link_range = self.output_area.tag_prevrange("link", f"{index} + 1c")
+        if not link_range or self.output_area.compare(link_range[1], "<=", index):
+            return None
+        start, end = link_range
+        for event, tag_name, tag_index in self.output_area.dump(start, end, tag=True):
+            if tag_name in ("link", "sel") or tag_index == start:
+                continue
+            if self.output_area.compare(tag_index, "<=", index):
+                start = tag_index
+            else:
+                end = tag_index
+                break
+        offset = (self.output_area.count(start, index, "chars") or (0,))[0]
+        for match in re.finditer(r"\S+", self.output_area.get(start, end)):
+            if match.start() <= offset < match.end():
+                return match.group(0)
+        return None
+
+    def report_filtered_lines(self):
+        """Say in the console how many lines each line filter rule has hidden so far."""
+        hidden = self.line_filter.stats()
+        if hidden:
+            counts = ", ".join(f"{name} {count}" for name, count in sorted(hidden.items(), key=lambda item: -item[1]))
+            self.append_output(f"Console lines hidden by filters: {counts}\n")
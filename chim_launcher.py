@@ -1,16 +1,80 @@
+import time
+STARTUP_STARTED = time.perf_counter()
+import argparse
+import sys
+
+from chim_services import ProxyServices, StartupScheduler, StartupTrace, WslExecutor, WslFileCache, add_service_arguments, run_headless
+
+def parse_launcher_args(argv=None):
+    """Parse launcher command line options, ignoring anything unrecognized."""
+    parser = argparse.ArgumentParser(description="Dwemer Distro Launcher")
+    add_service_arguments(parser)
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run only the proxy and discovery services, without the launcher window"
+    )
+    parser.add_argument(
+        "--profile-startup",
+        nargs="?",
+        const="startup_profile.json",
+        default=None,
+        metavar="PATH",
+        help="Write startup timings (imports, widgets, images, settings, version checks, proxy bind) "
+             "as a Chrome trace to PATH (default startup_profile.json)"
+    )
+    parser.add_argument(
+        "--console-max-lines",
+        type=int,
+        default=20000,
+        metavar="N",
+        help="Console scrollback in lines; older lines are deleted (default 20000, 0 = unlimited)"
+    )
+    parser.add_argument(
+        "--console-max-chars",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Console scrollback in characters, roughly bytes for log output (default 0 = unlimited)"
+    )
+    parser.add_argument(
+        "--console-filter",
+        action="append",
+        metavar="REGEX",
+        help="Hide console lines matching REGEX (matched at the start of the line); can be repeated"
+    )
+    args, _unknown = parser.parse_known_args(argv)
+    return args
+
+# Headless mode needs none of the window's packages, so it starts before they are imported
+if __name__ == "__main__":
+    launcher_options = parse_launcher_args()
+    if launcher_options.headless:
+        sys.exit(run_headless(launcher_options))
+
+# The heavy imports are timed for --profile-startup (see DwemerDistroLauncher.write_startup_profile)
+STARTUP_IMPORT_SPANS = []
+import_started = time.perf_counter()
 import tkinter as tk
 from tkinter import font, scrolledtext, messagebox
 from tkinter import ttk  # Added import for ttk
+STARTUP_IMPORT_SPANS.append(("import tkinter", import_started, time.perf_counter()))
 import subprocess
 import threading
 import re
+import_started = time.perf_counter()
 import requests
+STARTUP_IMPORT_SPANS.append(("import requests", import_started, time.perf_counter()))
+import_started = time.perf_counter()
 from bs4 import BeautifulSoup
+STARTUP_IMPORT_SPANS.append(("import bs4", import_started, time.perf_counter()))
 import webbrowser
 import datetime
 import sys
 import os
+import_started = time.perf_counter()
 from PIL import Image, ImageTk
+STARTUP_IMPORT_SPANS.append(("import PIL", import_started, time.perf_counter()))
 import http.server
 import socketserver
 import urllib.parse
@@ -18,188 +82,51 @@ import urllib.request
 import io # Added for reading request body
 import tkinter.filedialog # Added for save dialog
 import shlex
+import json
 from collections import deque
 
-import socket
 import threading
-import select
-import sys
-
-CHIM_LAUNCHER_VERSION = "2.5.1.0"
-
-class SimpleTCPProxy(threading.Thread):
-    def __init__(self, listen_addr, target_addr_func, launcher_instance):
-        super().__init__(daemon=True)
-        self.listen_addr = listen_addr  # e.g., ('127.0.0.1', 7513)
-        self.target_addr_func = target_addr_func  # function that returns ('wsl_ip', 8081)
-        self.launcher = launcher_instance
-        self.should_stop = threading.Event()
-
-    def run(self):
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind(self.listen_addr)
-        s.listen(16)
-        self.launcher.append_output(f"TCP Proxy listening on {self.listen_addr[0]}:{self.listen_addr[1]}\n")
-        while not self.should_stop.is_set():
-            try:
-                client_sock, addr = s.accept()
-                threading.Thread(target=self.handle_client, args=(client_sock,), daemon=True).start()
-            except:
-                break  # If socket is closed, exit
-        s.close()
-        self.launcher.append_output("TCP Proxy stopped.\n")
-
-    def handle_client(self, client_sock):
-        try:
-            target_ip, target_port = self.target_addr_func()
-            if not target_ip:
-                client_sock.close()
-                self.launcher.append_output("Proxy: Could not get WSL IP.\n", "red")
-                return
-            # Connect to target
-            server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server_sock.connect((target_ip, target_port))
-        except Exception as e:
-            self.launcher.append_output(f"Proxy: Error connecting to target: {e}\n", "red")
-            client_sock.close()
-            return
-
-        # Two-way relay, simple select loop
-        sockets = [client_sock, server_sock]
-        try:
-            while True:
-                rlist, _, _ = select.select(sockets, [], [], 1)
-                if client_sock in rlist:
-                    data = client_sock.recv(4096)
-                    if not data:
-                        break
-                    server_sock.sendall(data)
-                if server_sock in rlist:
-                    data = server_sock.recv(4096)
-                    if not data:
-                        break
-                    client_sock.sendall(data)
-        except Exception as e:
-            # self.launcher.append_output(f"Proxy relay error: {e}\n", "red")
-            pass
-        finally:
-            client_sock.close()
-            server_sock.close()
-
-    def shutdown(self):
-        self.should_stop.set()
-        # Dummy connection to exit the accept()
-        try:
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(self.listen_addr)
-        except:
-            pass
-
-
-class DiscoveryHTTPServer(threading.Thread):
-    """Simple HTTP server for auto-discovery on port 7135"""
-    def __init__(self, launcher_instance):
-        super().__init__(daemon=True)
-        self.launcher = launcher_instance
-        self.should_stop = threading.Event()
-        self.server_socket = None
-
-    def run(self):
-        try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind(('127.0.0.1', 7135))
-            self.server_socket.listen(5)
-            self.launcher.append_output("Discovery service listening on localhost:7135\n")
-            
-            while not self.should_stop.is_set():
-                try:
-                    self.server_socket.settimeout(1.0)  # Timeout to check should_stop
-                    client_socket, addr = self.server_socket.accept()
-                    threading.Thread(target=self.handle_discovery_request, args=(client_socket,), daemon=True).start()
-                except socket.timeout:
-                    continue
-                except:
-                    break
-        except Exception as e:
-            self.launcher.append_output(f"Discovery service error: {e}\n", "red")
-        finally:
-            if self.server_socket:
-                self.server_socket.close()
-            self.launcher.append_output("Discovery service stopped.\n")
-
-    def handle_discovery_request(self, client_socket):
-        try:
-            # Read the HTTP request
-            request = client_socket.recv(1024).decode('utf-8')
-            
-            # Check if it's a GET /discover request
-            if 'GET /discover' in request:
-                # Parse query params from the request line.
-                # Backward compatible default remains skyrim.
-                game = 'skyrim'
-                request_line = request.splitlines()[0] if request else ''
-                request_parts = request_line.split(' ')
-                if len(request_parts) >= 2:
-                    parsed_url = urllib.parse.urlparse(request_parts[1])
-                    params = urllib.parse.parse_qs(parsed_url.query)
-                    game_values = params.get('game', [])
-                    if game_values:
-                        game = game_values[0].strip().lower()
-
-                target_port = 8081
-                if game == 'kenshi' or game == 'stobe':
-                    target_port = 8083
-
-                # Get WSL IP
-                wsl_ip = self.launcher.get_wsl_ip(force_refresh=False)
-                if wsl_ip:
-                    response_body = f"{wsl_ip}:{target_port}"
-                    response = (
-                        "HTTP/1.1 200 OK\r\n"
-                        "Content-Type: text/plain\r\n"
-                        f"Content-Length: {len(response_body)}\r\n"
-                        "Connection: close\r\n"
-                        "\r\n"
-                        f"{response_body}"
-                    )
-                else:
-                    response_body = "WSL IP not available"
-                    response = (
-                        "HTTP/1.1 503 Service Unavailable\r\n"
-                        "Content-Type: text/plain\r\n"
-                        f"Content-Length: {len(response_body)}\r\n"
-                        "Connection: close\r\n"
-                        "\r\n"
-                        f"{response_body}"
-                    )
-            else:
-                # Return 404 for other requests
-                response_body = "Not Found"
-                response = (
-                    "HTTP/1.1 404 Not Found\r\n"
-                    "Content-Type: text/plain\r\n"
-                    f"Content-Length: {len(response_body)}\r\n"
-                    "Connection: close\r\n"
-                    "\r\n"
-                    f"{response_body}"
-                )
-            
-            client_socket.send(response.encode('utf-8'))
-        except Exception as e:
-            # Silent fail for discovery requests
-            pass
-        finally:
-            client_socket.close()
 
-    def shutdown(self):
-        self.should_stop.set()
-        # Dummy connection to exit the accept()
-        try:
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(('127.0.0.1', 7135))
-        except:
-            pass
+from chim_console import ANSI_TAG_COLORS, OUTPUT_FLUSH_INTERVAL_MS, AnsiSgrParser, ConsoleOutput, LineFilter
 
+CHIM_LAUNCHER_VERSION = "2.5.1.0"
+WSL_QUERY_TIMEOUT = 120 # Seconds a query through the WslExecutor may run before the session is restarted
+
+# Prints one JSON line with the git state of both server repos (see collect_repo_state).
+# Missing values are null. Version files are read by the WslFileCache lines appended after it.
+REPO_STATE_SCRIPT = r"""
+json_value() {
+    if [ -z "$1" ]; then printf 'null'; return; fi
+    local value="${1//[[:cntrl:]]/ }"
+    value="${value//\\/\\\\}"
+    printf '"%s"' "${value//\"/\\\"}"
+}
+repo_state() {
+    local repo=$1 branch head dirty=null
+    branch=$(git -C "$repo" rev-parse --abbrev-ref HEAD 2>/dev/null)
+    head=$(git -C "$repo" rev-parse --short HEAD 2>/dev/null)
+    if [ -n "$head" ]; then
+        dirty=false
+        [ -n "$(git -C "$repo" status --porcelain --untracked-files=no 2>/dev/null)" ] && dirty=true
+    fi
+    printf '{"branch":%s,"head":%s,"dirty":%s}' "$(json_value "$branch")" "$(json_value "$head")" "$dirty"
+}
+printf '{"repos":{"herika":%s,"stobe":%s}}\n' \
+    "$(repo_state /var/www/html/HerikaServer)" \
+    "$(repo_state /var/www/html/StobeServer)"
+"""
+# Version files for the repo state snapshot, first existing non-blank file wins
+DISTRO_VERSION_FILES = ["/home/dwemer/dwemerdistro/.version.txt", "/etc/.version.txt"]
+REPO_VERSION_FILES = {
+    "herika": {
+        "version": ["/var/www/html/HerikaServer/.version.txt"],
+        "version_number": ["/var/www/html/HerikaServer/.version_number.txt"],
+    },
+    "stobe": {
+        "version": ["/var/www/html/StobeServer/.version.txt", "/var/www/html/StobeServer/version.txt"],
+        "version_number": ["/var/www/html/StobeServer/.version_number.txt", "/var/www/html/StobeServer/versionnumber.txt"],
+    },
+}
 
 def get_resource_path(filename):
     """Get the absolute path to a resource, works for PyInstaller."""
@@ -211,9 +138,17 @@ def get_resource_path(filename):
     return os.path.join(base_path, filename)
 
 
-class DwemerDistroLauncher(tk.Tk):
-    def __init__(self):
+class DwemerDistroLauncher(ConsoleOutput, tk.Tk):
+    def __init__(self, options=None):
+        startup_origin = time.perf_counter()
         super().__init__()
+        # Command line options (see parse_launcher_args); defaults when constructed directly
+        self.options = options if options is not None else parse_launcher_args([])
+        # Startup timings, only recorded with --profile-startup
+        self.startup_trace = StartupTrace(origin=STARTUP_STARTED, enabled=bool(self.options.profile_startup))
+        for name, start, end in STARTUP_IMPORT_SPANS:
+            self.startup_trace.add(name, start, end, "import")
+        self.startup_trace.add("tk_root", startup_origin, time.perf_counter())
         self.title("Dwemer Distro")
         # Make window wider and taller, disable resizing
         self.geometry("880x980") 
@@ -222,9 +157,9 @@ class DwemerDistroLauncher(tk.Tk):
 
         self.bold_font = font.Font(family="Trebuchet MS", size=12, weight="bold")
         
-        # Link handling for output area
-        self.link_tag_counter = 0
-        self.link_tags = {}
+        # Console output: any thread appends (text, tag) runs per line, flush_output draws them in batches
+        self.output_queue = deque()
+        self.output_stats = {"lines": 0, "flushes": 0, "largest_batch": 0, "trimmed_lines": 0}
 
         # Initialize server running state
         self.server_running = False
@@ -239,16 +174,14 @@ class DwemerDistroLauncher(tk.Tk):
         self.update_status_animation_running = False
         self.update_status_animation_dots = 0
 
-        # Proxy variables
-        self.wsl_ip = None
-        self.proxy_server = None
-        self.proxy_thread = None
-        self.proxy_port = 7513 # Port the launcher will listen on
-        self.proxy_timeout = 60 # Timeout in seconds for proxy requests
-        # self.proxy_status = "neutral" # Removed proxy status tracking
+        # Every wsl.exe call goes through here: pooled shells for queries, hidden-window subprocesses
+        self.wsl = WslExecutor()
+        # Small files inside the distro (version files), read through self.wsl and cached by stat
+        self.wsl_files = WslFileCache(self.wsl)
 
-        # Discovery service variables
-        self.discovery_server = None
+        # Proxy, discovery and WSL IP tracking (chim_services, shared with headless mode)
+        self.services = ProxyServices(self, self.options, on_distro_missing=self.show_distro_missing, wsl=self.wsl)
+        # self.proxy_status = "neutral" # Removed proxy status tracking
 
         # Add flag for connection status logging - REMOVED
         # self.wsl_connection_reported = False
@@ -261,119 +194,93 @@ class DwemerDistroLauncher(tk.Tk):
         self.latest_chim_nexus_version = "N/A"
         self.latest_stobe_nexus_version = "N/A"
 
-        self.create_widgets()
-        self.load_mcp_enabled_setting()
-        self.load_update_include_settings()
+        with self.startup_trace.span("create_widgets"):
+            self.create_widgets()
+
+        # Lines the console drops (separator art, the shutdown prompt), plus any --console-filter patterns
+        self.line_filter = LineFilter()
+        for number, pattern in enumerate(self.options.console_filter or [], 1):
+            try:
+                self.line_filter.add_rule(f"custom_{number}", pattern=pattern)
+            except ValueError as e:
+                self.append_output(f"Ignoring --console-filter: {e}\n", "red")
+        self.after(OUTPUT_FLUSH_INTERVAL_MS, self.flush_output)
 
         # Set the window icon
         self.set_window_icon('DwemerDistro.png') 
 
         # Bind the window close event to on_close method
         self.protocol("WM_DELETE_WINDOW", self.on_close)
-        
-        # Start the update check in a separate thread
-        threading.Thread(target=self.check_for_updates, daemon=True).start()
-        threading.Thread(target=self.check_stobeserver_updates, daemon=True).start()
-        
-        # Start the Nexus version check in a separate thread
-        threading.Thread(target=self.check_nexus_version, daemon=True).start()
-        threading.Thread(target=self.check_stobe_nexus_version, daemon=True).start()
-        
-        # Start the proxy server and discovery service
-        self.start_proxy_server()
-        self.start_discovery_service()
-
-    def start_proxy_server(self):
-        try:
-            def target_addr_func():
-                wsl_ip = self.get_wsl_ip(force_refresh=True)
-                return (wsl_ip, 8081) if wsl_ip else (None, None)
-            self.proxy_server = SimpleTCPProxy(('127.0.0.1', self.proxy_port), target_addr_func, self)
-            self.proxy_server.start()
-        except Exception as e:
-            self.append_output(f"Proxy Error: {e}\n", "red")
-            self.proxy_server = None
 
-    def start_discovery_service(self):
+        # Everything that waits on WSL or the network runs in the background, so the window paints
+        # straight away with placeholder state (settings default on, version labels "Checking...").
+        self.startup = StartupScheduler(origin=startup_origin, on_complete=self.report_startup)
+        self.startup_profile_written = False
+        # WSL IP watcher (idle until the distro starts or a client asks), proxy server and discovery service
+        self.startup.add("services", lambda: self.services.start(self.startup_trace))
+        self.startup.add("mcp_setting", self.load_mcp_enabled_setting)
+        self.startup.add("update_include_settings", self.load_update_include_settings)
+        # The settings loads boot a stopped distro; version checks queue behind them instead of racing the boot.
+        # Both checks read the same repo state snapshot, taken once.
+        self.startup_repo_state = None
+        self.startup.add("repo_state", self.load_startup_repo_state, after=["mcp_setting", "update_include_settings"])
+        self.startup.add("herikaserver_version", lambda: self.check_for_updates(self.startup_repo_state), after=["repo_state"])
+        self.startup.add("stobeserver_version", lambda: self.check_stobeserver_updates(self.startup_repo_state), after=["repo_state"])
+        self.startup.add("chim_nexus_version", self.check_nexus_version)
+        self.startup.add("stobe_nexus_version", self.check_stobe_nexus_version)
+        self.first_map_binding = self.bind("<Map>", self.on_first_map, add="+")
+        self.startup.start()
+
+    def on_first_map(self, event):
+        """Record time-to-first-frame once the window is mapped and its first redraw has run."""
+        if event.widget is not self:
+            return
+        self.unbind("<Map>", self.first_map_binding)
+        self.after_idle(self.record_first_frame)
+
+    def record_first_frame(self):
+        first_frame_ms = self.startup.mark("first_frame")
+        if self.options.profile_startup:
+            print(f"Startup: first frame after {first_frame_ms:.0f} ms")
+        self.write_startup_profile()
+
+    def report_startup(self, scheduler):
+        """With --profile-startup, print how long each background startup stage took (called once they have all finished)."""
+        if not self.options.profile_startup:
+            return
+        timings = scheduler.timings()["stages"]
+        summary = ", ".join(
+            f"{name} {stage['duration_ms']:.0f} ms" + (f" (failed: {stage['error']})" if stage["error"] else "")
+            for name, stage in sorted(timings.items(), key=lambda item: item[1]["started_ms"])
+        )
+        print(f"Startup stages: {summary}")
+        self.write_startup_profile()
+
+    def write_startup_profile(self):
+        """Write the --profile-startup trace once the first frame is painted and every stage has finished."""
+        path = self.options.profile_startup
+        stages = self.startup.stages.values()
+        if not path or "first_frame" not in self.startup.marks or not all(stage["done"] for stage in stages):
+            return
+        with self.startup.lock:
+            # The last stage and the first frame can finish at the same time
+            if self.startup_profile_written:
+                return
+            self.startup_profile_written = True
+        self.startup_trace.add_scheduler(self.startup)
         try:
-            self.discovery_server = DiscoveryHTTPServer(self)
-            self.discovery_server.start()
-        except Exception as e:
-            self.append_output(f"Discovery Service Error: {e}\n", "red")
-            self.discovery_server = None
-
-    def on_close(self):
-        if hasattr(self, 'proxy_server') and self.proxy_server:
-            self.proxy_server.shutdown()
-        if hasattr(self, 'discovery_server') and self.discovery_server:
-            self.discovery_server.shutdown()
-
-
-            
-    def get_wsl_ip(self, force_refresh=False):
-        """Get the IP address of the WSL instance. Caches the result. Only logs if IP changes."""
-        current_ip = self.wsl_ip # Store current cached IP
-        
-        if current_ip and not force_refresh:
-            return current_ip
+            self.startup_trace.write(path)
+            self.append_output(f"Startup profile written to {os.path.abspath(path)}\n", "green")
+        except OSError as e:
+            self.append_output(f"Could not write startup profile: {e}\n", "red")
 
-        new_ip = None # Initialize new_ip
-        try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-            
-            cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "hostname", "-I"]
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                check=True, 
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            ip_address = result.stdout.strip().split()[0]
-            if ip_address:
-                new_ip = ip_address # Store the successfully found IP
-            else:
-                self.append_output("Failed to parse WSL IP address from output.\n")
-                # Keep self.wsl_ip as is (or None if it was None)
-                return current_ip # Return previous IP if parsing failed
+    def get_wsl_ip(self, force_refresh=False, timeout=10):
+        """Get the IP address of the WSL instance from the background watcher."""
+        return self.services.get_wsl_ip(force_refresh, timeout)
 
-        except FileNotFoundError:
-            self.append_output("Error: 'wsl' command not found. Is WSL installed and in PATH?\n")
-            self.wsl_ip = None # Can't get IP, clear it
-            return None
-        except subprocess.CalledProcessError as e:
-            # Check if the error is specifically because the distro is not found
-            distro_not_found_msg = "no distribution with the supplied name"
-            if e.stderr and distro_not_found_msg in e.stderr.lower():
-                error_message = (
-                    "Dwemer Distro is not installed! Download it here:\n"
-                    "https://www.nexusmods.com/skyrimspecialedition/mods/126330?tab=files"
-                )
-                self.append_output(f"Error: {error_message}\n", "red")
-                # Use after() to ensure messagebox runs on the main thread
-                self.after(0, lambda: messagebox.showerror("Distro Not Found", error_message))
-            else:
-                # Log other CalledProcessErrors as before
-                self.append_output(f"Error checking WSL IP: {e}\nStderr: {e.stderr}\n")
-            self.wsl_ip = None # Assume IP is invalid if command fails
-            return None
-        except Exception as e:
-            self.append_output(f"An unexpected error occurred while getting WSL IP: {e}\n")
-            self.wsl_ip = None
-            return None
-            
-        # Only log and update cache if the new IP is valid and different from the current one
-        if new_ip and new_ip != current_ip:
-             self.append_output(f"DwemerDistro WSL IP: {new_ip}\n")
-             self.wsl_ip = new_ip
-        elif new_ip and not current_ip: # First time finding a valid IP
-             self.append_output(f"DwemerDistro WSL IP: {new_ip}\n")
-             self.wsl_ip = new_ip
-             
-        return self.wsl_ip # Return the newly found/cached IP
+    def show_distro_missing(self, error_message):
+        # Use after() to ensure messagebox runs on the main thread
+        self.after(0, lambda: messagebox.showerror("Distro Not Found", error_message))
 
     def set_window_icon(self, icon_filename):
         """Sets the window icon for the application."""
@@ -381,7 +288,8 @@ class DwemerDistroLauncher(tk.Tk):
         print(f"Attempting to set icon using path: {icon_path}") 
 
         try:
-            icon_image = tk.PhotoImage(file=icon_path)
+            with self.startup_trace.span(f"image {icon_filename}", "image"):
+                icon_image = tk.PhotoImage(file=icon_path)
             self.iconphoto(False, icon_image)
         except Exception as e:
             print(f"Error setting icon: {e}")
@@ -435,10 +343,20 @@ class DwemerDistroLauncher(tk.Tk):
         # Configure basic color tags
         self.output_area.tag_config('green', foreground='lime green')
         self.output_area.tag_config('red', foreground='red')
-        
-        # We'll initialize ANSI color tags on first use in process_ansi_escape_sequences
-        # Mark that we haven't initialized them yet
-        self._ansi_tags_initialized = False
+
+        # ANSI color tags, plain and bold, for colored distro output
+        bold_font = ('Consolas', 10, 'bold')
+        self.output_area.tag_config('bold', font=bold_font)
+        for name, color in ANSI_TAG_COLORS.items():
+            self.output_area.tag_config(name, foreground=color)
+            self.output_area.tag_config(f'bold_{name}', foreground=color, font=bold_font)
+
+        # One shared tag and one set of bindings for every URL in the output.
+        # The tagged text is the URL itself, so a click reads it back from the tag's range.
+        self.output_area.tag_config("link", foreground="#6495ED", underline=True) # Cornflower blue
+        self.output_area.tag_bind("link", "<Enter>", self._on_link_enter)
+        self.output_area.tag_bind("link", "<Leave>", self._on_link_leave)
+        self.output_area.tag_bind("link", "<Button-1>", self._on_link_click)
 
         # Initial state
         self.output_area.config(state=tk.DISABLED)
@@ -472,8 +390,9 @@ class DwemerDistroLauncher(tk.Tk):
         # Load the image
         image_path = get_resource_path('dd_title.png')
         try:
-            image = Image.open(image_path)
-            photo = ImageTk.PhotoImage(image)
+            with self.startup_trace.span("image dd_title.png", "image"):
+                image = Image.open(image_path)
+                photo = ImageTk.PhotoImage(image)
         except Exception as e:
             print(f"Error loading image: {e}")
             photo = None
@@ -835,25 +754,22 @@ class DwemerDistroLauncher(tk.Tk):
     def run_wsl_silently(self):
         try:
             # Start the WSL process without showing a window
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # 0 = SW_HIDE
-
-            self.process = subprocess.Popen(
+            self.process = self.wsl.popen(
                 ["wsl", "-d", "DwemerAI4Skyrim3", "--", "/etc/start_env"],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             self.append_output("DwemerDistro is starting up.\n")
+            # Let the watcher poll (with backoff) while the distro boots
+            self.services.ip_watcher.resume()
 
             # Read output line by line
+            ansi = AnsiSgrParser()
             for line in self.process.stdout:
-                self.append_output(line)
+                self.append_output(line, ansi=ansi)
                 # Check if the server is ready
                 if "AIAgent.ini Network Settings:" in line:
                     self.server_running = True
@@ -862,11 +778,13 @@ class DwemerDistroLauncher(tk.Tk):
                     self.after(0, self.set_server_running)
                     self.append_output("Server is ready.\n")
                     self.wsl_server_ready = True # Set the flag here
-                    # Trigger WSL IP check now that server is ready
-                    self.after(100, lambda: threading.Thread(target=self.get_wsl_ip, args=(True,), daemon=True).start()) # Force refresh
+                    # Reported on /ready; also has the watcher re-verify the WSL IP now that server is ready
+                    self.services.set_server_ready(True)
                     # Continue reading output until the process ends
 
             self.process.wait()
+            self.services.set_server_ready(False)
+            self.report_filtered_lines()
 
             # When process ends, re-enable Start button and disable Stop button
             self.update_buttons_after_process()
@@ -907,16 +825,14 @@ class DwemerDistroLauncher(tk.Tk):
             else:
                 self.append_output("DwemerDistro process not running or already stopped.\n") # Clarified message
 
-            # Terminate the WSL distribution (optional)
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # 0 = SW_HIDE
+            # Periodic IP checks and idle WSL shells would keep the distro running
+            self.services.ip_watcher.suspend()
+            self.wsl.close_sessions()
 
-            subprocess.run(
+            # Terminate the WSL distribution (optional)
+            self.wsl.run_process(
                 ["wsl", "-t", "DwemerAI4Skyrim3"],
-                check=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                check=True
             )
             self.append_output("DwemerDistro terminated.\n") # Clarified message
 
@@ -939,16 +855,14 @@ class DwemerDistroLauncher(tk.Tk):
 
     def force_stop_wsl_thread(self):
         try:
-            # Force terminate the WSL distribution
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # 0 = SW_HIDE
+            # Periodic IP checks and idle WSL shells would keep the distro running
+            self.services.ip_watcher.suspend()
+            self.wsl.close_sessions()
 
-            subprocess.run(
+            # Force terminate the WSL distribution
+            self.wsl.run_process(
                 ["wsl", "-t", "DwemerAI4Skyrim3"],
                 check=True, # Note: This might throw if already stopped, consider remove check=True
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
             )
             self.append_output("DwemerDistro force terminated command sent.\n")
 
@@ -1016,26 +930,21 @@ class DwemerDistroLauncher(tk.Tk):
                 )
 
             # Run the update command
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # 0 = SW_HIDE
-
-            update_process = subprocess.Popen(
+            update_process = self.wsl.popen(
                 ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "/usr/local/bin/update_gws"],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             self.append_output("Update started.\n")
 
             # Read output line by line
             branch_error_detected = False
+            ansi = AnsiSgrParser()
             for line in update_process.stdout:
-                self.append_output(line)
+                self.append_output(line, ansi=ansi)
                 lowered = line.lower()
                 if (
                     "you are not currently on a branch" in lowered
@@ -1093,30 +1002,20 @@ class DwemerDistroLauncher(tk.Tk):
             self.append_output("Starting distro update...\n")
             
             # Run git pull command to update the repository
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # 0 = SW_HIDE
-
             # First, check if the directory exists, create it if not
             check_dir_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                          "mkdir -p /home/dwemer/dwemerdistro"]
             
-            subprocess.run(
-                check_dir_cmd,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            self.wsl.run_process(check_dir_cmd)
 
             # Check if this is a git repository already
             check_git_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                          "cd /home/dwemer/dwemerdistro && git status 2>/dev/null || echo 'Not a git repository'"]
             
-            result = subprocess.run(
+            result = self.wsl.run_process(
                 check_git_cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             # If not a git repository, clone it
@@ -1125,19 +1024,18 @@ class DwemerDistroLauncher(tk.Tk):
                 clone_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                           "cd /home/dwemer && git clone https://github.com/abeiro/dwemerdistro.git"]
                 
-                clone_process = subprocess.Popen(
+                clone_process = self.wsl.popen(
                     clone_cmd,
                     stdin=subprocess.PIPE,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
-                    text=True,
-                    startupinfo=startupinfo,
-                    creationflags=subprocess.CREATE_NO_WINDOW
+                    text=True
                 )
                 
                 # Read output line by line
+                ansi = AnsiSgrParser()
                 for line in clone_process.stdout:
-                    self.append_output(line)
+                    self.append_output(line, ansi=ansi)
                 
                 clone_process.wait()
             else:
@@ -1146,19 +1044,18 @@ class DwemerDistroLauncher(tk.Tk):
                 pull_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                          "cd /home/dwemer/dwemerdistro && git fetch origin && git reset --hard origin/main"]
                 
-                pull_process = subprocess.Popen(
+                pull_process = self.wsl.popen(
                     pull_cmd,
                     stdin=subprocess.PIPE,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
-                    text=True,
-                    startupinfo=startupinfo,
-                    creationflags=subprocess.CREATE_NO_WINDOW
+                    text=True
                 )
                 
                 # Read output line by line
+                ansi = AnsiSgrParser()
                 for line in pull_process.stdout:
-                    self.append_output(line)
+                    self.append_output(line, ansi=ansi)
                 
                 pull_process.wait()
             
@@ -1166,12 +1063,10 @@ class DwemerDistroLauncher(tk.Tk):
             get_repo_version_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                           "cd /home/dwemer/dwemerdistro && cat .version.txt"]
             
-            repo_version_result = subprocess.run(
+            repo_version_result = self.wsl.run_process(
                 get_repo_version_cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
             repo_version = repo_version_result.stdout.strip()
             
@@ -1182,19 +1077,18 @@ class DwemerDistroLauncher(tk.Tk):
             update_script_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                            "cd /home/dwemer/dwemerdistro && chmod +x update.sh && echo 'dwemer' | sudo -S ./update.sh"]
             
-            update_script_process = subprocess.Popen(
+            update_script_process = self.wsl.popen(
                 update_script_cmd,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
             
             # Read output line by line
+            ansi = AnsiSgrParser()
             for line in update_script_process.stdout:
-                self.append_output(line)
+                self.append_output(line, ansi=ansi)
             
             update_script_process.wait()
             
@@ -1207,11 +1101,7 @@ class DwemerDistroLauncher(tk.Tk):
                                       f"echo '{repo_version}' | sudo tee /etc/.version.txt > /dev/null && " +
                                       f"echo '{repo_version}' | tee /home/dwemer/dwemerdistro/.version.txt > /dev/null"]
                     
-                    subprocess.run(
-                        update_version_cmd,
-                        startupinfo=startupinfo,
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
+                    self.wsl.run_process(update_version_cmd)
                     self.append_output(f"Distro updated to version {repo_version}.\n", "green")
                     
                     # Recheck version and status after update
@@ -1240,33 +1130,34 @@ class DwemerDistroLauncher(tk.Tk):
     def on_close(self):
         # Confirm exit with the user
         if messagebox.askokcancel("Quit", "Do you really want to quit? This will stop the server if running."):
-            # Stop the proxy server first
-            if self.proxy_server:
-                self.append_output("Shutting down proxy server...\n")
-                try:
-                    self.proxy_server.shutdown()
-                    self.proxy_server.server_close()
-                    self.append_output("Proxy server shut down.\n")
-                except Exception as e:
-                    self.append_output(f"Error shutting down proxy server: {e}\n")
-                    
+            # Stop the proxy, discovery and WSL IP services first
+            self.append_output("Shutting down proxy server...\n")
+            try:
+                self.services.stop()
+                self.append_output("Proxy server shut down.\n")
+            except Exception as e:
+                self.append_output(f"Error shutting down proxy server: {e}\n")
+
+            # Idle shells and the query pool; wsl -t below runs as its own process
+            self.wsl.close()
+
             # Force stop the WSL distribution
             threading.Thread(target=self.force_stop_wsl_thread, daemon=True).start()
             
             # Destroy the window 
             self.destroy()
 
-    def _on_link_enter(self, event, tag_name):
-        """Handle mouse entering a link tag."""
+    def _on_link_enter(self, event):
+        """Handle mouse entering a link."""
         self.output_area.config(cursor="hand2")
 
-    def _on_link_leave(self, event, tag_name):
-        """Handle mouse leaving a link tag."""
+    def _on_link_leave(self, event):
+        """Handle mouse leaving a link."""
         self.output_area.config(cursor="")
 
-    def _on_link_click(self, event, tag_name):
-        """Handle mouse clicking a link tag."""
-        url = self.link_tags.get(tag_name)
+    def _on_link_click(self, event):
+        """Handle mouse clicking a link."""
+        url = self.link_url_at(self.output_area.index(f"@{event.x},{event.y}"))
         if url:
             try:
                 webbrowser.open_new(url)
@@ -1274,266 +1165,23 @@ class DwemerDistroLauncher(tk.Tk):
                 print(f"Error opening link '{url}': {e}")
                 self.append_output(f"Error opening link: {e}\n", "red")
 
-    def append_output(self, text, tag=None):
-        # Process ANSI escape sequences in the text instead of removing them
-        processed_text, ansi_tags = self.process_ansi_escape_sequences(text)
-
-        # Check if the cleaned text matches unwanted patterns
-        if self.is_unwanted_line(processed_text):
-            return  # Skip appending this line
-
-        # Regex to find URLs
-        url_regex = re.compile(r'(https?://\S+)')
-
-        # Append text to the output area in a thread-safe way
-        def update_text():
-            self.output_area.config(state=tk.NORMAL)
-            
-            # If we have ANSI color tags, use them for styling
-            if ansi_tags:
-                current_pos = 0
-                for start, end, color in ansi_tags:
-                    # Insert text before the colored segment with regular tag
-                    if start > current_pos:
-                        pre_text = processed_text[current_pos:start]
-                        # Process URLs in this segment
-                        self._insert_with_url_detection(pre_text, tag)
-                    
-                    # Insert the colored segment with its color tag
-                    colored_text = processed_text[start:end]
-                    # Process URLs in the colored segment
-                    self._insert_with_url_detection(colored_text, color)
-                    
-                    current_pos = end
-                
-                # Insert any remaining text after the last colored segment
-                if current_pos < len(processed_text):
-                    remaining_text = processed_text[current_pos:]
-                    self._insert_with_url_detection(remaining_text, tag)
-            else:
-                # No ANSI colors, just insert with regular tag and URL detection
-                self._insert_with_url_detection(processed_text, tag)
-            
-            self.output_area.see(tk.END)
-            self.output_area.config(state=tk.DISABLED)
-
-        self.output_area.after(0, update_text)
-    
-    def _insert_with_url_detection(self, text, tag=None):
-        """Helper method to insert text with URL detection and optional tag."""
-        url_regex = re.compile(r'(https?://\S+)')
-        last_end = 0
-        found_link = False
-        
-        for match in url_regex.finditer(text):
-            found_link = True
-            start, end = match.span()
-            url = match.group(0)
-
-            # Insert text before the link
-            if start > last_end:
-                if tag:
-                    self.output_area.insert(tk.END, text[last_end:start], tag)
-                else:
-                    self.output_area.insert(tk.END, text[last_end:start])
-
-            # Create unique tag for this link
-            link_tag_name = f"link_{self.link_tag_counter}"
-            self.link_tag_counter += 1
-            self.link_tags[link_tag_name] = url
-
-            # Insert the link text with its unique tag and the original tag (if any)
-            tags_to_apply = (link_tag_name,)
-            if tag:
-                tags_to_apply += (tag,)
-            self.output_area.insert(tk.END, url, tags_to_apply)
-
-            # Configure the link tag appearance and bindings
-            self.output_area.tag_config(link_tag_name, foreground="#6495ED", underline=True) # Cornflower blue
-            self.output_area.tag_bind(link_tag_name, "<Enter>", lambda e, name=link_tag_name: self._on_link_enter(e, name))
-            self.output_area.tag_bind(link_tag_name, "<Leave>", lambda e, name=link_tag_name: self._on_link_leave(e, name))
-            self.output_area.tag_bind(link_tag_name, "<Button-1>", lambda e, name=link_tag_name: self._on_link_click(e, name))
-
-            last_end = end
-
-        # Insert any remaining text after the last link (or the whole text if no links)
-        if last_end < len(text):
-            if tag:
-                self.output_area.insert(tk.END, text[last_end:], tag)
-            else:
-                self.output_area.insert(tk.END, text[last_end:])
-
     def process_ansi_escape_sequences(self, text):
         """Process ANSI escape sequences in text, returning cleaned text and color tags.
-        
+
+        Parses text on its own, without the color state append_output keeps between lines.
+
         Returns:
             tuple: (cleaned_text, list_of_tags)
             - cleaned_text: Text with ANSI escape sequences removed
             - list_of_tags: List of (start, end, tag_name) tuples for colored regions
         """
-        # Regular expression to match ANSI color codes
-        ansi_color_pattern = re.compile(r'\x1B\[((?:\d+;)*\d+)m')
-        
-        # ANSI color code to Tkinter tag mapping
-        ansi_to_tag = {
-            '0': None,       # Reset
-            '1': 'bold',     # Bold
-            '2': None,       # Dim (not supported)
-            '3': None,       # Italic (not supported)
-            '4': None,       # Underline (not supported)
-            '22': None,      # Reset bold
-            '30': 'black',   # Black
-            '31': 'red',     # Red
-            '32': 'green',   # Green
-            '33': 'yellow',  # Yellow
-            '34': 'blue',    # Blue
-            '35': 'purple',  # Purple/Magenta
-            '36': 'cyan',    # Cyan
-            '37': 'white',   # White
-            '39': None,      # Default foreground color
-            '90': 'gray',    # Bright Black (gray)
-            '91': 'bright_red',    # Bright Red
-            '92': 'bright_green',  # Bright Green
-            '93': 'bright_yellow', # Bright Yellow
-            '94': 'bright_blue',   # Bright Blue
-            '95': 'bright_purple', # Bright Magenta
-            '96': 'bright_cyan',   # Bright Cyan
-            '97': 'bright_white',  # Bright White
-            # Bold + color combinations
-            '1;30': 'bold_black',     # Bold Black
-            '1;31': 'bold_red',       # Bold Red
-            '1;32': 'bold_green',     # Bold Green
-            '1;33': 'bold_yellow',    # Bold Yellow
-            '1;34': 'bold_blue',      # Bold Blue
-            '1;35': 'bold_purple',    # Bold Purple/Magenta
-            '1;36': 'bold_cyan',      # Bold Cyan
-            '1;37': 'bold_white',     # Bold White
-            '1;90': 'bold_gray',      # Bold Gray
-            '1;91': 'bold_bright_red',     # Bold Bright Red
-            '1;92': 'bold_bright_green',   # Bold Bright Green
-            '1;93': 'bold_bright_yellow',  # Bold Bright Yellow
-            '1;94': 'bold_bright_blue',    # Bold Bright Blue
-            '1;95': 'bold_bright_purple',  # Bold Bright Purple
-            '1;96': 'bold_bright_cyan',    # Bold Bright Cyan
-            '1;97': 'bold_bright_white',   # Bold Bright White
-        }
-        
-        # Ensure we have all the color tags defined in the text widget
-        if not hasattr(self, '_ansi_tags_initialized'):
-            # Basic styles
-            self.output_area.tag_config('bold', font=('Consolas', 10, 'bold'))
-            
-            # Basic colors
-            self.output_area.tag_config('black', foreground='black')
-            self.output_area.tag_config('red', foreground='red')
-            self.output_area.tag_config('green', foreground='lime green')
-            self.output_area.tag_config('yellow', foreground='#FFD700')  # Gold
-            self.output_area.tag_config('blue', foreground='#1E90FF')    # Dodger Blue
-            self.output_area.tag_config('purple', foreground='#DA70D6')  # Orchid
-            self.output_area.tag_config('cyan', foreground='#00FFFF')    # Cyan
-            self.output_area.tag_config('white', foreground='white')
-            self.output_area.tag_config('gray', foreground='#A9A9A9')    # Dark Gray
-            
-            # Bright colors
-            self.output_area.tag_config('bright_red', foreground='#FF6347')    # Tomato
-            self.output_area.tag_config('bright_green', foreground='#00FF00')  # Lime
-            self.output_area.tag_config('bright_yellow', foreground='#FFFF00') # Yellow
-            self.output_area.tag_config('bright_blue', foreground='#00BFFF')   # Deep Sky Blue
-            self.output_area.tag_config('bright_purple', foreground='#FF00FF') # Fuchsia
-            self.output_area.tag_config('bright_cyan', foreground='#00FFFF')   # Aqua
-            self.output_area.tag_config('bright_white', foreground='#FFFFFF')  # White
-            
-            # Bold colors
-            self.output_area.tag_config('bold_black', foreground='black', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_red', foreground='red', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_green', foreground='lime green', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_yellow', foreground='#FFD700', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_blue', foreground='#1E90FF', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_purple', foreground='#DA70D6', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_cyan', foreground='#00FFFF', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_white', foreground='white', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_gray', foreground='#A9A9A9', font=('Consolas', 10, 'bold'))
-            
-            # Bold bright colors
-            self.output_area.tag_config('bold_bright_red', foreground='#FF6347', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_bright_green', foreground='#00FF00', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_bright_yellow', foreground='#FFFF00', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_bright_blue', foreground='#00BFFF', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_bright_purple', foreground='#FF00FF', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_bright_cyan', foreground='#00FFFF', font=('Consolas', 10, 'bold'))
-            self.output_area.tag_config('bold_bright_white', foreground='#FFFFFF', font=('Consolas', 10, 'bold'))
-            
-            self._ansi_tags_initialized = True
-        
-        # Start with clean text and no tags
-        cleaned_text = ""
+        cleaned_text, runs = AnsiSgrParser().feed(text)
         color_tags = []
-        current_tag = None
-        
-        # Split the text by ANSI escape sequences
-        segments = ansi_color_pattern.split(text)
-        i = 0
-        
-        while i < len(segments):
-            if i % 2 == 0:
-                # This is text content
-                segment_text = segments[i]
-                start_pos = len(cleaned_text)
-                cleaned_text += segment_text
-                end_pos = len(cleaned_text)
-                
-                # If we have a current tag and this segment has text, add a tag entry
-                if current_tag is not None and segment_text:
-                    color_tags.append((start_pos, end_pos, current_tag))
-            else:
-                # This is a color code
-                color_code = segments[i]
-                # Handle multiple color codes separated by semicolons
-                if ';' in color_code:
-                    # For combined codes, first check if the whole code is defined
-                    if color_code in ansi_to_tag:
-                        current_tag = ansi_to_tag[color_code]
-                    else:
-                        # Otherwise try to find the most important code
-                        codes = color_code.split(';')
-                        # First check for known combined codes
-                        if '1' in codes:  # Bold indicator
-                            # Try to find a color code
-                            for code in codes:
-                                if code in ['30', '31', '32', '33', '34', '35', '36', '37', '90', '91', '92', '93', '94', '95', '96', '97']:
-                                    bold_color_code = f"1;{code}"
-                                    if bold_color_code in ansi_to_tag:
-                                        current_tag = ansi_to_tag[bold_color_code]
-                                        break
-                        else:
-                            # Use the last recognized code
-                            for code in reversed(codes):
-                                if code in ansi_to_tag:
-                                    current_tag = ansi_to_tag[code]
-                                    break
-                elif color_code == '0':
-                    # Reset code
-                    current_tag = None
-                else:
-                    # For simple codes
-                    current_tag = ansi_to_tag.get(color_code, current_tag)
-            
-            i += 1
-        
-        # Also remove any remaining ANSI sequences we didn't handle
-        ansi_escape = re.compile(r'''
-            \x1B  # ESC
-            (?:   # 7-bit C1 Fe (except CSI)
-                [@-Z\\-_]
-            |     # or [ for CSI, followed by control codes
-                \[
-                [0-?]*  # Parameter bytes
-                [ -/]*  # Intermediate bytes
-                [@-~]   # Final byte
-            )
-        ''', re.VERBOSE)
-        cleaned_text = ansi_escape.sub('', cleaned_text)
-        
+        position = 0
+        for run_text, tag in runs:
+            if tag is not None:
+                color_tags.append((position, position + len(run_text), tag))
+            position += len(run_text)
         return cleaned_text, color_tags
 
     def remove_ansi_escape_sequences(self, text):
@@ -1541,25 +1189,6 @@ class DwemerDistroLauncher(tk.Tk):
         cleaned_text, _ = self.process_ansi_escape_sequences(text)
         return cleaned_text
 
-    def is_unwanted_line(self, text):
-        # Define unwanted patterns
-        unwanted_patterns = [
-            r'^[\s_¯]+$',          # Lines that contain only whitespace, underscores, or '¯' characters
-            r'^_+$',               # Lines that contain only underscores
-            r'^¯+$',               # Lines that contain only '¯' characters
-            r'^=+$',               # Lines that contain only equal signs
-            r'^\s*$',              # Empty or whitespace-only lines
-            r'^(__|¯¯){3,}$',      # Lines with repeated '__' or '¯¯' patterns
-            r'^(\s*_{5,}\s*)+$',   # Lines with 5 or more underscores
-            r'^(\s*¯{5,}\s*)+$',   # Lines with 5 or more '¯' characters
-            r'^.*¯Â.*$',           # Lines that contain '¯Â' anywhere
-            r'^.*Press Enter to shutdown DwemerDistro.*$',  # Lines that contain the shutdown message
-        ]
-        for pattern in unwanted_patterns:
-            if re.match(pattern, text):
-                return True  # This is an unwanted line
-        return False  # This line is acceptable
-
     def configure_installed_components(self):
         threading.Thread(target=self.configure_installed_components_thread, daemon=True).start()
 
@@ -2242,19 +1871,18 @@ class DwemerDistroLauncher(tk.Tk):
                 self.append_output(f"{result.stdout.strip()}\n")
 
             self.append_output("Restarting WSL to apply DNS settings...\n")
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-            subprocess.run(
+            self.wsl.run_process(
                 ["wsl", "--shutdown"],
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
+            # Pooled shells died with the shutdown; the check below must start a fresh one
+            self.wsl.close_sessions()
 
             # Trigger WSL startup and verify DNS resolution.
             verify_result = self.run_wsl_bash_capture("getent hosts github.com | head -n 1")
+            # The restarted distro usually has a new IP; publish it to the proxy and /discover/watch clients
+            self.services.ip_watcher.request_refresh()
             if verify_result.returncode == 0 and verify_result.stdout.strip():
                 self.append_output("WSL DNS repair completed successfully.\n", "green")
                 self.append_output(f"github.com resolves to: {verify_result.stdout.strip()}\n", "green")
@@ -2271,29 +1899,19 @@ class DwemerDistroLauncher(tk.Tk):
         except Exception as e:
             self.append_output(f"Error during WSL DNS repair: {e}\n", "red")
 
-    def run_wsl_bash_capture(self, bash_command):
-        """Run a bash command in WSL and return completed process output."""
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = 0  # SW_HIDE
+    def run_wsl_bash_capture(self, bash_command, user="dwemer", timeout=WSL_QUERY_TIMEOUT, coalesce=False):
+        """Run a bash command in WSL and return completed process output.
 
-        # wsl.exe can pre-expand unescaped $VARS before bash sees the command.
-        # Escape dollars so bash receives and expands them correctly.
-        safe_command = (bash_command or "").replace("$", r"\$")
+        Goes through the WslExecutor's persistent shells instead of spawning
+        wsl.exe. The command reaches bash verbatim over stdin, so $VARS no
+        longer need escaping against wsl.exe's argument expansion. Read-only
+        queries can pass coalesce=True to share the result of an identical one
+        already running (e.g. two status refreshes).
 
-        cmd = [
-            "wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--",
-            "bash", "-lc", safe_command
-        ]
-        return subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            startupinfo=startupinfo,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        A command that overruns timeout raises TimeoutExpired and restarts its
+        shell; pass timeout=None for network commands (git clone/fetch).
+        """
+        return self.wsl.run(bash_command or "", user=user, timeout=timeout, coalesce=coalesce)
 
     def ensure_herikaserver_attached_branch(self):
         """Ensure HerikaServer is on a tracked branch before updates."""
@@ -2349,7 +1967,8 @@ class DwemerDistroLauncher(tk.Tk):
             "mkdir -p \"$repo_path/log\" || { echo ERROR:LOG_DIR_FAILED:$repo_path/log >&2; exit 1; }; "
             ": > \"$repo_path/log/stobe_import.log\" || { echo ERROR:LOG_RESET_FAILED:$repo_path/log/stobe_import.log >&2; exit 1; }; "
             ": > \"$repo_path/log/stobeserver.log\" || { echo ERROR:LOG_RESET_FAILED:$repo_path/log/stobeserver.log >&2; exit 1; }; "
-            "echo \"$state\""
+            "echo \"$state\"",
+            timeout=None # git clone over the network may take a while
         )
 
         output = result.stdout.strip()
@@ -2417,7 +2036,8 @@ class DwemerDistroLauncher(tk.Tk):
         result = self.run_wsl_bash_capture(
             f"cd {config['repo_path']} && "
             "git rev-parse --abbrev-ref HEAD && "
-            "git rev-parse --short HEAD"
+            "git rev-parse --short HEAD",
+            coalesce=True
         )
         if result.returncode != 0:
             return None, None
@@ -2440,13 +2060,49 @@ class DwemerDistroLauncher(tk.Tk):
         branch, _ = self.get_stobeserver_head_info()
         return branch
 
+    def collect_repo_state(self):
+        """Branch, HEAD, versions and dirty state of both server repos plus the distro version.
+
+        Runs REPO_STATE_SCRIPT in one WSL round trip, with the version files
+        read through the stat-keyed WSL file cache so repeated checks only
+        transfer files that changed. Returns
+        {"distro_version": ..., "repos": {"herika": {...}, "stobe": {...}}},
+        or None if WSL could not be queried. Startup takes one snapshot for all
+        version checks (load_startup_repo_state); checks started together later
+        still share a single run through the WslExecutor.
+        """
+        paths = DISTRO_VERSION_FILES + [
+            path for files in REPO_VERSION_FILES.values() for candidates in files.values() for path in candidates
+        ]
+        script = REPO_STATE_SCRIPT + self.wsl_files.read_script(paths)
+        try:
+            result = self.wsl.run(script, timeout=WSL_QUERY_TIMEOUT, label="repo state", coalesce=True)
+            if result.returncode != 0:
+                return None
+            state_line, *file_lines = result.stdout.splitlines()
+            state = json.loads(state_line)
+        except Exception:
+            return None
+
+        texts = self.wsl_files.parse_read(paths, file_lines)
+        state["distro_version"] = self.wsl_files.first_text(texts, DISTRO_VERSION_FILES)
+        for repo, files in REPO_VERSION_FILES.items():
+            for field, candidates in files.items():
+                state["repos"][repo][field] = self.wsl_files.first_text(texts, candidates)
+        return state
+
+    def load_startup_repo_state(self):
+        """Take the repo state snapshot the startup version checks share."""
+        self.startup_repo_state = self.collect_repo_state()
+
     def get_commit_file_first_line(self, repo_path, commit_sha, file_candidates):
         """Return the first non-empty line found in candidate files at a commit."""
         commit_sha_safe = shlex.quote(commit_sha)
         for file_name in file_candidates:
             file_name_safe = shlex.quote(file_name)
             result = self.run_wsl_bash_capture(
-                f"cd {repo_path} && git show {commit_sha_safe}:{file_name_safe} 2>/dev/null | sed -n '1p'"
+                f"cd {repo_path} && git show {commit_sha_safe}:{file_name_safe} 2>/dev/null | sed -n '1p'",
+                coalesce=True
             )
             if result.returncode != 0:
                 continue
@@ -2466,7 +2122,8 @@ class DwemerDistroLauncher(tk.Tk):
         history_result = self.run_wsl_bash_capture(
             f"cd {repo_path} && "
             "git fetch --all --tags --quiet && "
-            f"git log --date=short --pretty=format:'%H\t%h\t%cd' -n 40 -- {history_files_arg}"
+            f"git log --date=short --pretty=format:'%H\t%h\t%cd' -n 40 -- {history_files_arg}",
+            timeout=None # git fetch over the network may take a while
         )
         if history_result.returncode != 0:
             return targets
@@ -2697,25 +2354,20 @@ class DwemerDistroLauncher(tk.Tk):
                 "echo 'ROLLBACK_HEAD:'$(git rev-parse --short HEAD)"
             ]
 
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
-            process = subprocess.Popen(
+            process = self.wsl.popen(
                 rollback_cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             rolled_back_sha = None
+            ansi = AnsiSgrParser()
             for line in process.stdout:
                 output_line = line.rstrip("\n")
                 if output_line.startswith("ROLLBACK_HEAD:"):
                     rolled_back_sha = output_line.split(":", 1)[1].strip()
-                self.append_output(f"{output_line}\n")
+                self.append_output(f"{output_line}\n", ansi=ansi)
 
             process.wait()
             if process.returncode != 0:
@@ -2883,45 +2535,29 @@ class DwemerDistroLauncher(tk.Tk):
     def load_mcp_enabled_setting(self):
         """Load MCP enabled state from WSL flag file. Default is enabled."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
-            cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "--", "bash", "-lc", "if [ -f /home/dwemer/.mcp_enabled ]; then cat /home/dwemer/.mcp_enabled; else echo 1 > /home/dwemer/.mcp_enabled; echo 1; fi"]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+            result = self.run_wsl_bash_capture(
+                "if [ -f /home/dwemer/.mcp_enabled ]; then cat /home/dwemer/.mcp_enabled; else echo 1 > /home/dwemer/.mcp_enabled; echo 1; fi",
+                user=None
             )
 
-            if result.returncode == 0:
-                value = result.stdout.strip()
-                self.mcp_enabled_var.set(value == "1")
-            else:
-                self.mcp_enabled_var.set(True)
+            enabled = result.returncode != 0 or result.stdout.strip() == "1"
         except Exception:
-            self.mcp_enabled_var.set(True)
+            enabled = True
+        # Runs on a startup worker thread; Tk variables are set from the main loop
+        self.after(0, self.mcp_enabled_var.set, enabled)
 
     def save_mcp_enabled_setting(self):
         """Persist MCP enabled state to WSL flag file."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
             value = "1" if self.mcp_enabled_var.get() else "0"
             cmd = [
                 "wsl", "-d", "DwemerAI4Skyrim3", "--", "bash", "-lc",
                 f"echo {value} > /home/dwemer/.mcp_enabled"
             ]
-            result = subprocess.run(
+            result = self.wsl.run_process(
                 cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             if result.returncode == 0:
@@ -2937,24 +2573,13 @@ class DwemerDistroLauncher(tk.Tk):
     def load_update_include_settings(self):
         """Load updater include toggles from WSL flag files."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
-            cmd = [
-                "wsl", "-d", "DwemerAI4Skyrim3", "-u", "root", "--", "bash", "-lc",
+            result = self.run_wsl_bash_capture(
                 "mkdir -p /home/dwemer; "
                 "if [ ! -f /home/dwemer/.update_include_herika ]; then echo 1 > /home/dwemer/.update_include_herika; fi; "
                 "if [ ! -f /home/dwemer/.update_include_stobe ]; then echo 1 > /home/dwemer/.update_include_stobe; fi; "
                 "sed -n '1p' /home/dwemer/.update_include_herika; "
-                "sed -n '1p' /home/dwemer/.update_include_stobe"
-            ]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                "sed -n '1p' /home/dwemer/.update_include_stobe",
+                user="root"
             )
 
             if result.returncode == 0:
@@ -2965,22 +2590,16 @@ class DwemerDistroLauncher(tk.Tk):
                     herika_value = "1"
                 if stobe_value not in ("0", "1"):
                     stobe_value = "1"
-                self.update_herikaserver_var.set(herika_value == "1")
-                self.update_stobeserver_var.set(stobe_value == "1")
             else:
-                self.update_herikaserver_var.set(True)
-                self.update_stobeserver_var.set(True)
+                herika_value = stobe_value = "1"
         except Exception:
-            self.update_herikaserver_var.set(True)
-            self.update_stobeserver_var.set(True)
+            herika_value = stobe_value = "1"
+        self.after(0, self.update_herikaserver_var.set, herika_value == "1")
+        self.after(0, self.update_stobeserver_var.set, stobe_value == "1")
 
     def save_update_include_settings(self):
         """Persist updater include toggles to WSL flag files."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
             herika_raw = str(self.update_herikaserver_var.get()).strip().lower()
             stobe_raw = str(self.update_stobeserver_var.get()).strip().lower()
             herika_value = "1" if herika_raw in ("1", "true", "yes", "on") else "0"
@@ -2990,12 +2609,10 @@ class DwemerDistroLauncher(tk.Tk):
                 f"echo {herika_value} > /home/dwemer/.update_include_herika && "
                 f"echo {stobe_value} > /home/dwemer/.update_include_stobe"
             ]
-            result = subprocess.run(
+            result = self.wsl.run_process(
                 cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             if result.returncode != 0:
@@ -3009,18 +2626,7 @@ class DwemerDistroLauncher(tk.Tk):
     def get_current_gpu_setting(self):
         """Get the current GPU setting from WSL."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
-            cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "--", "cat", "/home/dwemer/.cuda_config"]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            result = self.run_wsl_bash_capture("cat /home/dwemer/.cuda_config", user=None)
             
             if result.returncode == 0:
                 for line in result.stdout.split('\n'):
@@ -3041,10 +2647,6 @@ class DwemerDistroLauncher(tk.Tk):
     def save_cuda_setting(self, gpu_value, window):
         """Save the CUDA GPU setting to WSL."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
             if gpu_value == "all":
                 config_content = """#!/bin/bash
 # CUDA Device Configuration
@@ -3075,12 +2677,10 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "--", "bash", "-c", 
                    f"printf '%s' '{config_content_escaped}' > /home/dwemer/.cuda_config && chmod +x /home/dwemer/.cuda_config"]
             
-            result = subprocess.run(
+            result = self.wsl.run_process(
                 cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
             
             if result.returncode == 0:
@@ -3214,10 +2814,6 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             # Get current branch
             current_branch = self.get_current_branch()
             
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-            
             if current_branch == "aiagent":
                 # Currently on Release branch, switch to Dev
                 if messagebox.askyesno("Switch Branch", "Currently on Release branch. Switch to Dev branch?"):
@@ -3226,11 +2822,9 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                           "git stash save 'Auto-stash before switching branch' && "
                           "git fetch origin && "
                           "git checkout -B dev origin/dev"]
-                    result = subprocess.run(cmd, 
+                    result = self.wsl.run_process(cmd, 
                                          capture_output=True, 
-                                         text=True,
-                                         startupinfo=startupinfo,
-                                         creationflags=subprocess.CREATE_NO_WINDOW)
+                                         text=True)
                     
                     self.append_output(f"Switching to Dev branch...\n")
                     
@@ -3259,11 +2853,9 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                           "git stash save 'Auto-stash before switching branch' && "
                           "git fetch origin && "
                           "git checkout -B aiagent origin/aiagent"]
-                    result = subprocess.run(cmd, 
+                    result = self.wsl.run_process(cmd, 
                                          capture_output=True, 
-                                         text=True,
-                                         startupinfo=startupinfo,
-                                         creationflags=subprocess.CREATE_NO_WINDOW)
+                                         text=True)
                     
                     self.append_output(f"Switching to Release branch...\n")
                     
@@ -3292,11 +2884,9 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                           "git stash save 'Auto-stash before switching branch' && "
                           "git fetch origin && "
                           "git checkout -B aiagent origin/aiagent"]
-                    result = subprocess.run(cmd, 
+                    result = self.wsl.run_process(cmd, 
                                          capture_output=True, 
-                                         text=True,
-                                         startupinfo=startupinfo,
-                                         creationflags=subprocess.CREATE_NO_WINDOW)
+                                         text=True)
                     
                     self.append_output(f"Switching to Release branch...\n")
                     
@@ -3321,61 +2911,28 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             self.append_output(f"Error switching branch: {str(e)}\n")
 
     # Updated methods for version checking
-    def get_current_server_version(self):
-        """Get the current server version by reading the version file directly."""
-        try:
-            version_file_path = r'\\wsl$\DwemerAI4Skyrim3\var\www\html\HerikaServer\.version.txt'
-            with open(version_file_path, 'r') as file:
-                version = file.read().strip()
-                return version
-        except Exception as e:
-            print(f"Exception in get_current_server_version: {e}")
-            return None
-
     def get_local_server_version(self):
         """Read server version from .version_number.txt."""
         try:
-            version_file = r'\\wsl$\DwemerAI4Skyrim3\var\www\html\HerikaServer\.version_number.txt'
-            with open(version_file, 'r') as f:
-                version = f.read().strip()
-                return version if version else None
+            return self.wsl_files.read_first("/var/www/html/HerikaServer/.version_number.txt")
         except Exception:
             return None
 
-    def get_current_stobeserver_version(self):
-        """Get StobeServer date version from .version.txt."""
-        try:
-            version_file_path = r'\\wsl$\DwemerAI4Skyrim3\var\www\html\StobeServer\.version.txt'
-            with open(version_file_path, 'r') as file:
-                version = file.read().strip()
-                return version if version else None
-        except Exception as e:
-            print(f"Exception in get_current_stobeserver_version: {e}")
-            return None
-
     def get_local_stobeserver_version(self):
         """Read StobeServer semantic version from .version_number.txt."""
         try:
-            candidates = [
-                r'\\wsl$\DwemerAI4Skyrim3\var\www\html\StobeServer\.version_number.txt',
-                r'\\wsl$\DwemerAI4Skyrim3\var\www\html\StobeServer\versionnumber.txt',
-            ]
-            for version_file in candidates:
-                if not os.path.exists(version_file):
-                    continue
-                with open(version_file, 'r') as f:
-                    version = f.read().strip()
-                    if version:
-                        return version
-            return None
+            return self.wsl_files.read_first(
+                "/var/www/html/StobeServer/.version_number.txt",
+                "/var/www/html/StobeServer/versionnumber.txt",
+            )
         except Exception:
             return None
 
-    def get_git_version(self):
+    def get_git_version(self, current_branch=None):
         """Get the latest server version from GitHub based on current branch."""
         try:
             # Get current branch first
-            current_branch = self.get_current_branch()
+            current_branch = current_branch or self.get_current_branch()
             if not current_branch:
                 print("Could not determine current branch")
                 return None
@@ -3393,10 +2950,10 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             print(f"Exception in get_git_version: {e}")
             return None
 
-    def get_stobeserver_git_version(self):
+    def get_stobeserver_git_version(self, current_branch=None):
         """Get latest StobeServer date version from GitHub based on current branch."""
         try:
-            current_branch = self.get_stobeserver_current_branch()
+            current_branch = current_branch or self.get_stobeserver_current_branch()
             if not current_branch:
                 print("Could not determine StobeServer current branch")
                 return None
@@ -3472,16 +3029,7 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
     def get_current_branch(self):
         """Get the current git branch."""
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
-            cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "cd", "/var/www/html/HerikaServer", "&&", "git", "rev-parse", "--abbrev-ref", "HEAD"]
-            result = subprocess.run(cmd, 
-                                  capture_output=True, 
-                                  text=True, 
-                                  startupinfo=startupinfo,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
+            result = self.run_wsl_bash_capture("cd /var/www/html/HerikaServer && git rev-parse --abbrev-ref HEAD")
             return result.stdout.strip()
         except Exception as e:
             print(f"Exception in get_current_branch: {e}")
@@ -3502,56 +3050,41 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
         except Exception:
             return version_str
 
-    def check_for_updates(self):
-        """Check if a newer server version is available and update the combined status label."""
+    def check_for_updates(self, repo_state=None):
+        """Check if a newer server version is available and update the combined status label.
+
+        repo_state is a collect_repo_state() snapshot to reuse; without one a fresh snapshot is taken.
+        """
         # Use after(0, ...) to ensure UI updates happen on the main thread
         update_label_config = lambda config: self.after(0, self.update_status_label.config, config)
 
         # Initial state while checking
         update_label_config({"text": "HerikaServer: Checking...", "fg": "white"})
 
-        # Start threads to get versions and branch concurrently
+        # Branch and local versions come from one repo state snapshot, then GitHub is asked for that branch
         # Use date-based version (.version.txt) for server update check
-        current_version = [None]
-        git_version = [None]
-        current_branch = [None]
-        semantic_version = [None]  # Add semantic version for display
-
-        def get_current_version_thread():
-            current_version[0] = self.get_current_server_version()  # Date-based version from .version.txt
-        def get_git_version_thread():
-            git_version[0] = self.get_git_version()  # Date-based version from GitHub
-        def get_branch_thread():
-            current_branch[0] = self.get_current_branch()
-        def get_semantic_version_thread():
-            semantic_version[0] = self.get_local_server_version()  # Semantic version from .version_number.txt
-
-        threads = [
-            threading.Thread(target=get_current_version_thread),
-            threading.Thread(target=get_git_version_thread),
-            threading.Thread(target=get_branch_thread),
-            threading.Thread(target=get_semantic_version_thread)
-        ]
-        for t in threads:
-            t.start()
-        for t in threads:
-            t.join() # Wait for all threads to complete
+        repo_state = repo_state or self.collect_repo_state()
+        repo = ((repo_state or {}).get("repos") or {}).get("herika") or {}
+        current_branch = repo.get("branch")
+        current_version = repo.get("version")  # Date-based version from .version.txt
+        semantic_version = repo.get("version_number")  # Semantic version from .version_number.txt
+        git_version = self.get_git_version(current_branch) if current_branch else None  # Date-based version from GitHub
 
-        if current_branch[0] in ("aiagent", "dev"):
-            self.after(0, self.update_target_branch_var.set, current_branch[0])
+        if current_branch in ("aiagent", "dev"):
+            self.after(0, self.update_target_branch_var.set, current_branch)
 
-        branch_text = f" ({current_branch[0]})" if current_branch[0] else ""
+        branch_text = f" ({current_branch})" if current_branch else ""
         # Format the date version for display (2025121413 -> 12-14-2025)
-        date_display = self.format_date_version(current_version[0]) if current_version[0] else "N/A"
-        semantic_display = semantic_version[0] if semantic_version[0] else "N/A"
+        date_display = self.format_date_version(current_version) if current_version else "N/A"
+        semantic_display = semantic_version if semantic_version else "N/A"
         # Combine date and semantic version
         version_display = f"{date_display} | {semantic_display}"
         final_text = ""
         text_color = "white" # Default color
 
-        if current_version[0] and git_version[0]:
+        if current_version and git_version:
             # Compare date-based versions (e.g., 2025121413)
-            comparison = self.compare_versions(current_version[0], git_version[0])
+            comparison = self.compare_versions(current_version, git_version)
             if comparison < 0:
                 # Update available - GitHub has newer server code
                 final_text = f"HerikaServer{branch_text}: Update Available [{version_display}]"
@@ -3560,7 +3093,7 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                 # Up-to-date - server code matches GitHub
                 final_text = f"HerikaServer{branch_text}: Fully Updated [{version_display}]"
                 text_color = "lime green"
-        elif current_version[0]:
+        elif current_version:
             # Have local version but no git version
             final_text = f"HerikaServer{branch_text}: [{version_display}]"
             text_color = "lime green"
@@ -3572,59 +3105,41 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
         # Update the label with final text and color
         update_label_config({"text": final_text, "fg": text_color})
 
-    def check_stobeserver_updates(self):
-        """Check if a newer StobeServer version is available and update status label."""
+    def check_stobeserver_updates(self, repo_state=None):
+        """Check if a newer StobeServer version is available and update status label.
+
+        repo_state is a collect_repo_state() snapshot to reuse; without one a fresh snapshot is taken.
+        """
         update_label_config = lambda config: self.after(0, self.stobe_update_status_label.config, config)
 
         update_label_config({"text": "StobeServer: Checking...", "fg": "white"})
 
-        current_version = [None]
-        git_version = [None]
-        current_branch = [None]
-        semantic_version = [None]
-
-        def get_current_version_thread():
-            current_version[0] = self.get_current_stobeserver_version()
-
-        def get_git_version_thread():
-            git_version[0] = self.get_stobeserver_git_version()
-
-        def get_branch_thread():
-            current_branch[0] = self.get_stobeserver_current_branch()
-
-        def get_semantic_version_thread():
-            semantic_version[0] = self.get_local_stobeserver_version()
-
-        threads = [
-            threading.Thread(target=get_current_version_thread),
-            threading.Thread(target=get_git_version_thread),
-            threading.Thread(target=get_branch_thread),
-            threading.Thread(target=get_semantic_version_thread)
-        ]
-        for t in threads:
-            t.start()
-        for t in threads:
-            t.join()
+        repo_state = repo_state or self.collect_repo_state()
+        repo = ((repo_state or {}).get("repos") or {}).get("stobe") or {}
+        current_branch = repo.get("branch")
+        current_version = repo.get("version")
+        semantic_version = repo.get("version_number")
+        git_version = self.get_stobeserver_git_version(current_branch) if current_branch else None
 
-        if current_branch[0] in ("stobe", "dev"):
-            self.after(0, self.update_stobeserver_branch_var.set, current_branch[0])
+        if current_branch in ("stobe", "dev"):
+            self.after(0, self.update_stobeserver_branch_var.set, current_branch)
 
-        branch_text = f" ({current_branch[0]})" if current_branch[0] else ""
-        date_display = self.format_date_version(current_version[0]) if current_version[0] else "N/A"
-        semantic_display = semantic_version[0] if semantic_version[0] else "N/A"
+        branch_text = f" ({current_branch})" if current_branch else ""
+        date_display = self.format_date_version(current_version) if current_version else "N/A"
+        semantic_display = semantic_version if semantic_version else "N/A"
         version_display = f"{date_display} | {semantic_display}"
         final_text = ""
         text_color = "white"
 
-        if current_version[0] and git_version[0]:
-            comparison = self.compare_versions(current_version[0], git_version[0])
+        if current_version and git_version:
+            comparison = self.compare_versions(current_version, git_version)
             if comparison < 0:
                 final_text = f"StobeServer{branch_text}: Update Available [{version_display}]"
                 text_color = "red"
             else:
                 final_text = f"StobeServer{branch_text}: Fully Updated [{version_display}]"
                 text_color = "lime green"
-        elif current_version[0]:
+        elif current_version:
             final_text = f"StobeServer{branch_text}: [{version_display}]"
             text_color = "lime green"
         else:
@@ -3700,10 +3215,6 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
         combined_log_content = "" # Initialize empty string for combined logs
         files_not_found = []
 
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = 0  # SW_HIDE
-
         for log_file in log_files:
             self.append_output(f"Reading {log_file}...")
             cmd = [
@@ -3712,13 +3223,11 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             ]
             try:
                 # Use run instead of Popen to capture output directly
-                result = subprocess.run(
+                result = self.wsl.run_process(
                     cmd, 
                     capture_output=True, 
                     text=True, 
                     check=False, # Don't raise error if tail fails (e.g., file not found)
-                    startupinfo=startupinfo,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
                     encoding='utf-8', errors='ignore' # Handle potential encoding issues
                 )
 
@@ -3828,8 +3337,11 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
         # Schedule the save dialog in the main GUI thread
         self.after(0, ask_save_file)
 
-    def check_distro_version(self):
-        """Check if a newer distro version is available and update the status label."""
+    def check_distro_version(self, repo_state=None):
+        """Check if a newer distro version is available and update the status label.
+
+        repo_state is a collect_repo_state() snapshot to reuse; without one a fresh snapshot is taken.
+        """
         # Use after(0, ...) to ensure UI updates happen on the main thread
         update_label_config = lambda config: self.after(0, self.distro_version_label.config, config)
 
@@ -3837,20 +3349,14 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
         update_label_config({"text": "Checking Distro Version...", "fg": "white"})
 
         try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0
-
             # Check repository version directly with curl for consistency
             check_repo_version_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                                 "curl -s https://raw.githubusercontent.com/abeiro/dwemerdistro/main/.version.txt"]
             
-            repo_version_result = subprocess.run(
+            repo_version_result = self.wsl.run_process(
                 check_repo_version_cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
             repo_version = repo_version_result.stdout.strip()
             
@@ -3863,18 +3369,12 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                 update_label_config({"text": final_text, "fg": text_color})
                 return
 
-            # Check current installed version - check both possible locations
-            check_current_version_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
-                                   "cat /home/dwemer/dwemerdistro/.version.txt 2>/dev/null || cat /etc/.version.txt 2>/dev/null || echo 'not_installed'"]
-            
-            current_version_result = subprocess.run(
-                check_current_version_cmd,
-                capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            current_version = current_version_result.stdout.strip()
+            # Current installed version (dwemerdistro/.version.txt, else /etc/.version.txt) from the repo state snapshot
+            repo_state = repo_state or self.collect_repo_state()
+            if repo_state is None:
+                current_version = ""
+            else:
+                current_version = repo_state.get("distro_version") or "not_installed"
             
             # Remove debug output
             # self.append_output(f"[DEBUG] Local version: {current_version}\n")
@@ -3884,11 +3384,7 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             if force_update and current_version != "not_installed" and current_version != repo_version:
                 update_version_cmd = ["wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c", 
                                  f"echo '{repo_version}' | sudo tee /home/dwemer/dwemerdistro/.version.txt > /dev/null"]
-                subprocess.run(
-                    update_version_cmd,
-                    startupinfo=startupinfo,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
+                self.wsl.run_process(update_version_cmd)
                 # Remove debug output
                 # self.append_output(f"[DEBUG] Forced local version update to: {repo_version}\n")
                 current_version = repo_version
@@ -4296,10 +3792,6 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
 
             self.append_output(f"Switching HerikaServer branch to '{normalized_branch}'...\n")
 
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
             switch_cmd = [
                 "wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c",
                 "cd /var/www/html/HerikaServer && "
@@ -4308,12 +3800,10 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                 f"git checkout -B {normalized_branch} origin/{normalized_branch}"
             ]
 
-            result = subprocess.run(
+            result = self.wsl.run_process(
                 switch_cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             if result.returncode != 0:
@@ -4378,10 +3868,6 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
 
             self.append_output(f"Switching StobeServer branch to '{normalized_branch}'...\n")
 
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # SW_HIDE
-
             switch_cmd = [
                 "wsl", "-d", "DwemerAI4Skyrim3", "-u", "dwemer", "--", "bash", "-c",
                 "cd /var/www/html/StobeServer && "
@@ -4390,12 +3876,10 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                 f"git checkout -B {normalized_branch} origin/{normalized_branch}"
             ]
 
-            result = subprocess.run(
+            result = self.wsl.run_process(
                 switch_cmd,
                 capture_output=True,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
 
             if result.returncode != 0:
@@ -4418,12 +3902,10 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                                 "yellow"
                             )
 
-                        result = subprocess.run(
+                        result = self.wsl.run_process(
                             switch_cmd,
                             capture_output=True,
-                            text=True,
-                            startupinfo=startupinfo,
-                            creationflags=subprocess.CREATE_NO_WINDOW
+                            text=True
                         )
                         if result.returncode == 0:
                             self.append_output(
@@ -4625,19 +4107,13 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                     "chmod +x update.sh && echo 'dwemer' | sudo -S ./update.sh"
                 ]
             
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = 0  # 0 = SW_HIDE
-            
             # Start the combined process
-            update_process = subprocess.Popen(
+            update_process = self.wsl.popen(
                 combined_cmd,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                text=True
             )
             
             # Variables to track update phases
@@ -4647,6 +4123,7 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             branch_error_detected = False
             
             # Read output line by line
+            ansi = AnsiSgrParser()
             for line in update_process.stdout:
                 # Check for our marker line
                 if server_update_requested and "=====MARKER:BEGIN_SERVER_UPDATE=====" in line:
@@ -4656,7 +4133,7 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
                     continue  # Skip the marker line itself
                 
                 # Output the line
-                self.append_output(line)
+                self.append_output(line, ansi=ansi)
 
                 lowered = line.lower()
                 if server_update_requested and (
@@ -4751,5 +4228,5 @@ export CUDA_VISIBLE_DEVICES={gpu_value}
             self.after(2000, lambda: threading.Thread(target=self.check_stobe_nexus_version, daemon=True).start())
 
 if __name__ == "__main__":
-    app = DwemerDistroLauncher()
+    app = DwemerDistroLauncher(launcher_options)
     app.mainloop()
@@ -0,0 +1,2681 @@
+"""Proxy, discovery, WSL IP and WSL shell services for the Dwemer Distro launcher.
+
+Nothing in this module depends on Tk, so the services can run inside the
+launcher window or on their own:
+
+    python chim_services.py [--proxy-engine asyncio] [--wsl-ip 172.20.0.2]
+
+Components log through any object with an append_output(text, tag=None)
+method; the launcher passes itself, headless mode uses ConsoleLogger.
+"""
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import datetime
+import hashlib
+import http.server
+import json
+import os
+import queue
+import select
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+WSL_DISTRO_NAME = "DwemerAI4Skyrim3"
+
+class WslTargetResolver:
+    """Caches the WSL IP for proxy target lookups.
+
+    The lookup callable spawns wsl.exe, so it only runs on a cache miss: the first
+    connect, after the TTL expires, or after a connect to the cached IP failed.
+    """
+    def __init__(self, lookup_ip, ttl=300):
+        self.lookup_ip = lookup_ip  # function that returns the current WSL IP or None
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.cached_ip = None
+        self.cached_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def resolve(self, target_port):
+        """Return (ip, port) for the target, or (None, None) if WSL has no IP."""
+        with self.lock:
+            if self.cached_ip and time.monotonic() - self.cached_at < self.ttl:
+                self.hits += 1
+                return self.cached_ip, target_port
+
+            # Lookup runs under the lock so a burst of misses forks wsl.exe only once
+            self.misses += 1
+            try:
+                wsl_ip = self.lookup_ip()
+            except Exception:
+                wsl_ip = None
+            self.cached_ip = wsl_ip
+            self.cached_at = time.monotonic()
+            if not wsl_ip:
+                return None, None
+            return wsl_ip, target_port
+
+    def update(self, new_ip, old_ip=None):
+        """WslIpWatcher subscriber: replace the cached IP with a freshly verified one."""
+        with self.lock:
+            self.cached_ip = new_ip
+            self.cached_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop the cached IP so the next resolve() performs a fresh lookup."""
+        with self.lock:
+            self.cached_ip = None
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "cached_ip": self.cached_ip,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+class WslIpWatcher(threading.Thread):
+    """Background monitor that owns the WSL IP and pushes changes to subscribers.
+
+    Between resume() and suspend() (the launcher started the distro) a missing IP
+    is retried with exponential backoff, since the distro may still be booting,
+    and a known IP is re-verified every refresh_interval seconds. Otherwise the
+    watcher is idle: request_refresh() and wait_for_ip() run a single lookup, so
+    a client asking while the distro is stopped does not keep booting it.
+    Request paths read the in-memory value and never spawn wsl.exe themselves.
+    """
+    def __init__(self, lookup_ip, refresh_interval=60, initial_backoff=0.5, max_backoff=30):
+        super().__init__(daemon=True)
+        self.lookup_ip = lookup_ip  # function that returns the current WSL IP or None
+        self.refresh_interval = refresh_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.condition = threading.Condition()
+        self.current_ip = None
+        self.subscribers = []
+        self.active = False  # periodic lookups run only while the distro is wanted (resume/suspend)
+        self.refresh_pending = False  # wake the loop for an immediate lookup
+        self.stale = False  # current_ip must be re-verified before wait_for_ip trusts it
+        self.should_stop = False
+        self.generation = 0  # completed lookups, lets waiters detect a fresh result
+        self.last_lookup = None  # monotonic time the last lookup finished
+        self.lookups = 0
+        self.failures = 0
+        self.changes = 0
+
+    def subscribe(self, callback):
+        """Register callback(new_ip, old_ip). It runs on the watcher thread."""
+        with self.condition:
+            self.subscribers.append(callback)
+
+    def request_refresh(self):
+        """Re-verify the IP as soon as possible. An idle watcher runs one lookup and stays idle."""
+        with self.condition:
+            self.refresh_pending = True
+            self.stale = True
+            self.condition.notify_all()
+
+    def resume(self):
+        """Look up the IP now and keep it current (the distro is starting) until suspend()."""
+        with self.condition:
+            self.active = True
+            self.refresh_pending = True
+            self.stale = True
+            self.condition.notify_all()
+
+    def suspend(self):
+        """Stop periodic lookups (e.g. the distro is being terminated) until the next resume()."""
+        with self.condition:
+            self.active = False
+            self.refresh_pending = False
+            self.condition.notify_all()
+
+    def wait_for_ip(self, timeout=10):
+        """Return the known IP, waiting up to timeout seconds for a lookup if there is none."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            if self.current_ip and not self.stale:
+                return self.current_ip
+            if not self.refresh_pending:
+                self.refresh_pending = True
+                self.condition.notify_all()
+            generation = self.generation
+            while self.generation == generation and not self.should_stop:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return self.current_ip
+
+    def peek_ip(self):
+        """The known IP without waiting, for request handlers.
+
+        With no IP known, starts a lookup in the background unless one finished
+        in the last refresh_interval seconds, so polling clients cannot turn
+        into a lookup (and a distro boot) per request.
+        """
+        with self.condition:
+            if not self.current_ip and not self.refresh_pending and (
+                self.last_lookup is None or time.monotonic() - self.last_lookup >= self.refresh_interval
+            ):
+                self.refresh_pending = True
+                self.condition.notify_all()
+            return self.current_ip
+
+    def stop(self):
+        with self.condition:
+            self.should_stop = True
+            self.condition.notify_all()
+
+    def run(self):
+        delay = 0
+        backoff = self.initial_backoff
+        while True:
+            with self.condition:
+                wake_at = time.monotonic() + delay
+                while not self.should_stop and not self.refresh_pending:
+                    remaining = wake_at - time.monotonic()
+                    if self.active and remaining <= 0:
+                        break
+                    self.condition.wait(remaining if self.active else None)
+                if self.should_stop:
+                    return
+                self.refresh_pending = False
+
+            try:
+                new_ip = self.lookup_ip()
+            except Exception:
+                new_ip = None
+
+            with self.condition:
+                old_ip = self.current_ip
+                self.current_ip = new_ip
+                self.stale = False
+                self.lookups += 1
+                self.generation += 1
+                self.last_lookup = time.monotonic()
+                if new_ip:
+                    delay = self.refresh_interval
+                    backoff = self.initial_backoff
+                else:
+                    self.failures += 1
+                    delay = backoff
+                    backoff = min(backoff * 2, self.max_backoff)
+                changed = new_ip != old_ip
+                if changed:
+                    self.changes += 1
+                subscribers = list(self.subscribers)
+                self.condition.notify_all()
+
+            if changed:
+                for callback in subscribers:
+                    try:
+                        callback(new_ip, old_ip)
+                    except Exception:
+                        pass
+
+    def stats(self):
+        with self.condition:
+            return {
+                "current_ip": self.current_ip,
+                "active": self.active,
+                "lookups": self.lookups,
+                "failures": self.failures,
+                "changes": self.changes,
+            }
+
+
+class HttpFramingError(ValueError):
+    """A Content-Length or chunk size that does not parse, so the message cannot be delimited."""
+
+
+def _http_header_value(headers, name):
+    """Return the last value of a header (case-insensitive), or None."""
+    value = None
+    for header_name, header_value in headers:
+        if header_name.lower() == name:
+            value = header_value
+    return value
+
+
+def _http_header_values(headers, name):
+    """Return every value of a header (case-insensitive), comma-joined lines split apart."""
+    values = []
+    for header_name, header_value in headers:
+        if header_name.lower() == name:
+            values.extend(value.strip() for value in header_value.split(","))
+    return values
+
+
+def _http_keep_alive(version, headers):
+    """Whether an HTTP/1.x message leaves the connection open afterwards."""
+    connection = (_http_header_value(headers, "connection") or "").lower()
+    if version == "HTTP/1.0":
+        return "keep-alive" in connection
+    return "close" not in connection
+
+
+def _http_body_framing(headers, request_method=None, status=None):
+    """Return how a message body is delimited: 'none', 'length', 'chunked' or 'close'."""
+    if status is not None:
+        if request_method == "HEAD" or 100 <= status < 200 or status in (204, 304):
+            return "none", 0
+    transfer_encodings = _http_header_values(headers, "transfer-encoding")
+    if transfer_encodings:
+        if transfer_encodings[-1].lower() == "chunked":
+            return "chunked", 0
+        # A request body has no other way to end; a response runs until the peer closes
+        if status is None:
+            raise HttpFramingError(f"Unsupported Transfer-Encoding: {', '.join(transfer_encodings)!r}")
+        return "close", 0
+    content_lengths = _http_header_values(headers, "content-length")
+    if content_lengths:
+        # Repeated headers, on separate lines or comma-joined, must all agree
+        lengths = set(content_lengths)
+        if len(lengths) != 1 or not content_lengths[0].isdigit():
+            raise HttpFramingError(f"Invalid Content-Length: {', '.join(content_lengths)!r}")
+        return "length", int(content_lengths[0])
+    # Requests without a length have no body; responses run until the peer closes
+    if status is None:
+        return "none", 0
+    return "close", 0
+
+
+def _http_simple_response(status_line, body):
+    body_bytes = body.encode("utf-8")
+    return (
+        f"HTTP/1.1 {status_line}\r\n"
+        "Content-Type: text/plain\r\n"
+        f"Content-Length: {len(body_bytes)}\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    ).encode("latin-1") + body_bytes
+
+
+class HttpMessageReader:
+    """Buffered reader that splits an HTTP/1.x byte stream on message boundaries."""
+    max_head_size = 65536
+    recv_size = 65536
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def _fill(self):
+        data = self.sock.recv(self.recv_size)
+        if not data:
+            return False
+        self.buffer += data
+        return True
+
+    def read_head(self):
+        """Return (start_line, headers, raw_head), or None on EOF before the first byte."""
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end >= 0:
+                break
+            if len(self.buffer) > self.max_head_size:
+                raise ValueError("HTTP head too large")
+            if not self._fill():
+                if self.buffer:
+                    raise ConnectionError("Connection closed in the middle of an HTTP head")
+                return None
+        raw_head = bytes(self.buffer[:end + 4])
+        del self.buffer[:end + 4]
+        lines = raw_head[:-4].decode("latin-1").split("\r\n")
+        headers = []
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers.append((name.strip(), value.strip()))
+        return lines[0], headers, raw_head
+
+    def _read_line(self):
+        while True:
+            end = self.buffer.find(b"\r\n")
+            if end >= 0:
+                line = bytes(self.buffer[:end + 2])
+                del self.buffer[:end + 2]
+                return line
+            if len(self.buffer) > self.max_head_size:
+                raise ValueError("HTTP chunk line too large")
+            if not self._fill():
+                raise ConnectionError("Connection closed in the middle of a chunked body")
+
+    def _read_upto(self, remaining):
+        if not self.buffer and not self._fill():
+            raise ConnectionError("Connection closed in the middle of an HTTP body")
+        chunk = bytes(self.buffer[:remaining])
+        del self.buffer[:len(chunk)]
+        return chunk
+
+    def iter_body(self, framing):
+        """Yield the raw body bytes (chunk framing included) for a (mode, length) framing."""
+        mode, length = framing
+        if mode == "length":
+            remaining = length
+            while remaining > 0:
+                chunk = self._read_upto(remaining)
+                remaining -= len(chunk)
+                yield chunk
+        elif mode == "chunked":
+            while True:
+                size_line = self._read_line()
+                try:
+                    chunk_size = int(size_line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise HttpFramingError(f"Invalid chunk size line: {size_line!r}") from None
+                yield size_line
+                if chunk_size == 0:
+                    # Trailer section ends with an empty line
+                    while True:
+                        trailer_line = self._read_line()
+                        yield trailer_line
+                        if trailer_line == b"\r\n":
+                            return
+                remaining = chunk_size + 2  # Chunk data plus its CRLF
+                while remaining > 0:
+                    chunk = self._read_upto(remaining)
+                    remaining -= len(chunk)
+                    yield chunk
+        elif mode == "close":
+            if self.buffer:
+                yield bytes(self.buffer)
+                self.buffer.clear()
+            while True:
+                data = self.sock.recv(self.recv_size)
+                if not data:
+                    return
+                yield data
+
+
+class UpstreamConnectionPool:
+    """Bounded pool of idle keep-alive sockets to the proxy target.
+
+    Idle sockets are evicted once they exceed idle_timeout, which stays below
+    Apache's default KeepAliveTimeout (5 s) so HerikaServer never closes a
+    socket we are about to reuse. Sockets the server closed early are detected
+    with a zero-timeout select before reuse.
+    """
+    def __init__(self, max_idle=8, idle_timeout=4.0):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = {}  # (ip, port) -> deque of (sock, released_at)
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def acquire(self, target_addr):
+        """Return a warm socket to target_addr, or None if none is available."""
+        while True:
+            with self.lock:
+                sockets = self.idle.get(target_addr)
+                if not sockets:
+                    return None
+                sock, released_at = sockets.pop()  # Most recently used first
+            if time.monotonic() - released_at > self.idle_timeout or not self._is_healthy(sock):
+                self.discard(sock)
+                continue
+            with self.lock:
+                self.reused += 1
+            return sock
+
+    def record_created(self):
+        with self.lock:
+            self.created += 1
+
+    def release(self, target_addr, sock):
+        """Return a socket whose last response completed cleanly to the pool."""
+        now = time.monotonic()
+        with self.lock:
+            sockets = self.idle.setdefault(target_addr, deque())
+            # Drop expired entries while we hold the lock anyway
+            while sockets and now - sockets[0][1] > self.idle_timeout:
+                expired_sock, _ = sockets.popleft()
+                self._close(expired_sock)
+                self.evicted += 1
+            if len(sockets) < self.max_idle:
+                sockets.append((sock, now))
+                return
+        self.discard(sock)
+
+    def discard(self, sock):
+        with self.lock:
+            self.evicted += 1
+        self._close(sock)
+
+    def clear(self):
+        with self.lock:
+            pooled = [sock for sockets in self.idle.values() for sock, _ in sockets]
+            self.idle.clear()
+        for sock in pooled:
+            self._close(sock)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "idle": sum(len(sockets) for sockets in self.idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
+
+    @staticmethod
+    def _is_healthy(sock):
+        try:
+            # An idle keep-alive socket must not be readable: that means EOF or stray bytes
+            readable, _, _ = select.select([sock], [], [], 0)
+            return not readable
+        except (OSError, ValueError):
+            return False
+
+    @staticmethod
+    def _close(sock):
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+
+def _latency_percentiles(samples):
+    """Nearest-rank p50/p95/p99 (milliseconds) over a window of samples."""
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None}
+    ordered = sorted(samples)
+    def rank(pct):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+    return {"count": len(ordered), "p50": rank(50), "p95": rank(95), "p99": rank(99)}
+
+
+class ProxyConnectionStats:
+    """Traffic and timing for one proxied client connection."""
+    def __init__(self, conn_id, client_addr, route=None):
+        self.conn_id = conn_id
+        self.client_addr = client_addr
+        self.route = route
+        self.opened_at = time.time()
+        self.started = time.monotonic()
+        self.bytes_up = 0  # client -> upstream
+        self.bytes_down = 0  # upstream -> client
+        self.connect_ms = None
+        self.ttfb_ms = None
+        self.duration_ms = None
+        self.close_reason = None
+        self.first_up_at = None
+
+    def record_connect(self, seconds):
+        self.connect_ms = seconds * 1000
+
+    def record_up(self, count):
+        if self.first_up_at is None:
+            self.first_up_at = time.monotonic()
+        self.bytes_up += count
+
+    def record_down(self, count):
+        # Time to first byte: first request byte sent upstream -> first response byte back
+        if self.ttfb_ms is None and self.first_up_at is not None:
+            self.ttfb_ms = (time.monotonic() - self.first_up_at) * 1000
+        self.bytes_down += count
+
+    def as_dict(self):
+        duration_ms = self.duration_ms
+        if duration_ms is None:
+            duration_ms = (time.monotonic() - self.started) * 1000
+        return {
+            "id": self.conn_id,
+            "route": self.route,
+            "client": f"{self.client_addr[0]}:{self.client_addr[1]}" if self.client_addr else None,
+            "opened_at": datetime.datetime.fromtimestamp(self.opened_at).isoformat(timespec="seconds"),
+            "bytes_up": self.bytes_up,
+            "bytes_down": self.bytes_down,
+            "connect_ms": round(self.connect_ms, 2) if self.connect_ms is not None else None,
+            "ttfb_ms": round(self.ttfb_ms, 2) if self.ttfb_ms is not None else None,
+            "duration_ms": round(duration_ms, 2),
+            "close_reason": self.close_reason,
+        }
+
+
+class ProxyMetrics:
+    """Per-connection and aggregate proxy metrics with rolling latency percentiles.
+
+    connect_ms is the TCP connect to the WSL target (the Hyper-V network hop);
+    ttfb_ms adds the server's processing time, so comparing the two shows where
+    a slow reply comes from.
+    """
+    def __init__(self, window=1000, recent=50):
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.active = {}
+        self.recent = deque(maxlen=recent)
+        self.connect_ms = deque(maxlen=window)
+        self.ttfb_ms = deque(maxlen=window)
+        self.duration_ms = deque(maxlen=window)
+        self.total_connections = 0
+        self.total_bytes_up = 0
+        self.total_bytes_down = 0
+        self.close_reasons = {}
+        self.routes = {}  # route name -> connection and byte totals
+        self.queued = 0  # Connections that waited for a free handler slot
+        self.rejected = 0
+        self.timed_out = 0
+
+    def open_connection(self, client_addr=None, route=None):
+        with self.lock:
+            stats = ProxyConnectionStats(self.next_id, client_addr, route)
+            self.next_id += 1
+            self.total_connections += 1
+            route_totals = self.routes.setdefault(route, {"connections": 0, "bytes_up": 0, "bytes_down": 0})
+            route_totals["connections"] += 1
+            self.active[stats.conn_id] = stats
+        return stats
+
+    def record_queued(self):
+        with self.lock:
+            self.queued += 1
+
+    def close_connection(self, stats, reason):
+        stats.duration_ms = (time.monotonic() - stats.started) * 1000
+        stats.close_reason = reason
+        with self.lock:
+            if self.active.pop(stats.conn_id, None) is None:
+                return  # Already closed
+            self.total_bytes_up += stats.bytes_up
+            self.total_bytes_down += stats.bytes_down
+            route_totals = self.routes[stats.route]
+            route_totals["bytes_up"] += stats.bytes_up
+            route_totals["bytes_down"] += stats.bytes_down
+            self.close_reasons[reason] = self.close_reasons.get(reason, 0) + 1
+            if reason == "rejected":
+                self.rejected += 1
+            elif reason.endswith("_timeout"):
+                self.timed_out += 1
+            if stats.connect_ms is not None:
+                self.connect_ms.append(stats.connect_ms)
+            if stats.ttfb_ms is not None:
+                self.ttfb_ms.append(stats.ttfb_ms)
+            self.duration_ms.append(stats.duration_ms)
+            self.recent.append(stats)
+
+    def snapshot(self):
+        """Return a JSON-serialisable view of all counters."""
+        with self.lock:
+            active = [stats.as_dict() for stats in self.active.values()]
+            return {
+                "total_connections": self.total_connections,
+                "active_connections": len(active),
+                "bytes_up": self.total_bytes_up + sum(item["bytes_up"] for item in active),
+                "bytes_down": self.total_bytes_down + sum(item["bytes_down"] for item in active),
+                "close_reasons": dict(self.close_reasons),
+                "routes": {str(route): dict(totals) for route, totals in self.routes.items()},
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "latency_ms": {
+                    "connect": _latency_percentiles(self.connect_ms),
+                    "ttfb": _latency_percentiles(self.ttfb_ms),
+                    "duration": _latency_percentiles(self.duration_ms),
+                },
+                "active": active,
+                "recent": [stats.as_dict() for stats in self.recent],
+            }
+
+
+def relay_sockets(sock_a, sock_b, chunk_size=65536, poll_interval=None, stats=None, idle_timeout=None, deadline=None):
+    """Two-way relay until either side reaches EOF or a timeout expires.
+
+    Each direction reads into its own preallocated buffer with recv_into and
+    forwards a memoryview slice, so streaming responses don't allocate a new
+    bytes object per read. sendall() keeps retrying partial sends of the slice.
+    sock_a is the client side, both for byte counts in stats and for the
+    returned close reason: 'client_closed', 'upstream_closed', 'idle_timeout'
+    or 'total_timeout'. deadline is a time.monotonic() value.
+    """
+    views = {
+        sock_a: (sock_b, memoryview(bytearray(chunk_size)), stats.record_up if stats else None, "client_closed"),
+        sock_b: (sock_a, memoryview(bytearray(chunk_size)), stats.record_down if stats else None, "upstream_closed"),
+    }
+    sockets = [sock_a, sock_b]
+    last_activity = time.monotonic()
+    while True:
+        wait = poll_interval
+        if deadline is not None or idle_timeout is not None:
+            now = time.monotonic()
+            if deadline is not None:
+                if now >= deadline:
+                    return "total_timeout"
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+            if idle_timeout is not None:
+                idle_left = last_activity + idle_timeout - now
+                if idle_left <= 0:
+                    return "idle_timeout"
+                wait = idle_left if wait is None else min(wait, idle_left)
+        rlist, _, _ = select.select(sockets, [], [], wait)
+        for src in rlist:
+            dst, view, record, eof_reason = views[src]
+            received = src.recv_into(view)
+            if not received:
+                return eof_reason
+            dst.sendall(view[:received])
+            if record:
+                record(received)
+        if rlist:
+            last_activity = time.monotonic()
+
+
+# Sent to clients turned away by admission control
+PROXY_BUSY_RESPONSE = _http_simple_response("503 Service Unavailable", "Proxy is at its connection limit, retry shortly")
+
+
+class SimpleTCPProxy(threading.Thread):
+    relay_chunk_size = 65536  # Per-direction buffer for the raw relay
+    handler_idle_timeout = 30  # seconds a handler thread waits for a connection before it exits
+    max_request_body = 64 * 1024 * 1024  # HTTP mode buffers requests so a stale pooled socket can be retried
+
+    def __init__(
+        self,
+        listen_addr,
+        target_addr_func,
+        logger,
+        on_connect_error=None,
+        upstream_pool=None,
+        metrics=None,
+        max_connections=32,
+        accept_queue_depth=64,
+        idle_timeout=60,
+        total_timeout=600,
+        route_name=None,
+    ):
+        super().__init__(daemon=True)
+        self.listen_addr = listen_addr  # e.g., ('127.0.0.1', 7513)
+        self.target_addr_func = target_addr_func  # function that returns ('wsl_ip', 8081)
+        self.logger = logger  # any object with append_output(text, tag=None)
+        self.on_connect_error = on_connect_error  # called before retrying a failed connect once
+        self.upstream_pool = upstream_pool  # enables HTTP-aware keep-alive mode when set
+        self.metrics = metrics if metrics is not None else ProxyMetrics()
+        self.max_connections = max_connections  # connections relayed at once (handler threads)
+        self.accept_queue_depth = accept_queue_depth  # accepted connections allowed to wait for a handler
+        self.idle_timeout = idle_timeout  # seconds without traffic before a connection is dropped
+        self.total_timeout = total_timeout  # upper bound on a connection's lifetime, queue time included
+        self.route_name = route_name  # PROXY_ROUTES entry served by this listener, for logs and metrics
+        self.pending = queue.Queue()
+        self.busy_lock = threading.Lock()  # guards the handler counts and queue puts
+        self.handler_count = 0  # live handler threads, started on demand up to max_connections
+        self.busy_handlers = 0
+        self.should_stop = threading.Event()
+
+    def run(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(self.listen_addr)
+        s.listen(self.accept_queue_depth)
+        route_text = f" ({self.route_name})" if self.route_name else ""
+        self.logger.append_output(f"TCP Proxy listening on {self.listen_addr[0]}:{self.listen_addr[1]}{route_text}\n")
+        while not self.should_stop.is_set():
+            try:
+                client_sock, addr = s.accept()
+            except:
+                break  # If socket is closed, exit
+            if self.should_stop.is_set():
+                client_sock.close()
+                break
+            # Responses often arrive as a head and a body write; Nagle would hold the body for a delayed ACK
+            client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.admit(client_sock, addr)
+        s.close()
+        self.drain_pending()
+        route_text = f" ({self.route_name})" if self.route_name else ""
+        self.logger.append_output(f"TCP Proxy stopped{route_text}.\n")
+
+    def admit(self, client_sock, addr):
+        """Hand an accepted connection to a handler, queue it, or reject it if the queue is full.
+
+        Handler threads start when no idle one is left, up to max_connections,
+        so an idle proxy holds no threads beyond its accept loop.
+        """
+        stats = self.metrics.open_connection(addr, self.route_name)
+        with self.busy_lock:
+            # Entries an idle handler is about to pick up don't count against the queue depth
+            waiting = self.pending.qsize() - (self.handler_count - self.busy_handlers)
+            if waiting >= 0 and self.handler_count < self.max_connections:
+                self.handler_count += 1
+                threading.Thread(target=self.connection_worker, daemon=True).start()
+                waiting -= 1
+            if waiting < self.accept_queue_depth:
+                # Put under the lock, so a handler cannot retire between the count above and the put
+                self.pending.put((client_sock, stats))
+        if waiting >= self.accept_queue_depth:
+            try:
+                client_sock.sendall(PROXY_BUSY_RESPONSE)
+            except OSError:
+                pass
+            client_sock.close()
+            self.metrics.close_connection(stats, "rejected")
+            return
+        if waiting >= 0:
+            self.metrics.record_queued()
+
+    def connection_worker(self):
+        while True:
+            try:
+                item = self.pending.get(timeout=self.handler_idle_timeout)
+            except queue.Empty:
+                with self.busy_lock:
+                    if self.pending.empty():
+                        self.handler_count -= 1
+                        return
+                continue
+            if item is None:
+                with self.busy_lock:
+                    self.handler_count -= 1
+                return
+            client_sock, stats = item
+            if self.should_stop.is_set():
+                client_sock.close()
+                self.metrics.close_connection(stats, "shutdown")
+                continue
+            with self.busy_lock:
+                self.busy_handlers += 1
+            try:
+                self.handle_client(client_sock, stats)
+            except Exception:
+                pass
+            finally:
+                with self.busy_lock:
+                    self.busy_handlers -= 1
+
+    def drain_pending(self):
+        """Close connections still waiting for a handler and stop the workers."""
+        while True:
+            try:
+                item = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                client_sock, stats = item
+                client_sock.close()
+                self.metrics.close_connection(stats, "shutdown")
+        with self.busy_lock:
+            handler_count = self.handler_count
+        for _ in range(handler_count):
+            self.pending.put(None)
+
+    def connect_to_target(self):
+        """Connect to the target, retrying once on a fresh lookup if the cached IP is stale."""
+        attempts = 2 if self.on_connect_error else 1
+        for attempt in range(attempts):
+            target_ip, target_port = self.target_addr_func()
+            if not target_ip:
+                return None
+            server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            server_sock.settimeout(self.idle_timeout or None)
+            try:
+                server_sock.connect((target_ip, target_port))
+                return server_sock
+            except OSError:
+                server_sock.close()
+                if attempt + 1 >= attempts:
+                    raise
+                self.on_connect_error()
+        return None
+
+    def handle_client(self, client_sock, stats=None):
+        if stats is None:
+            try:
+                client_addr = client_sock.getpeername()
+            except OSError:
+                client_addr = None
+            stats = self.metrics.open_connection(client_addr, self.route_name)
+        close_reason = "error"
+        try:
+            if self.upstream_pool is not None:
+                close_reason = self.handle_http_client(client_sock, stats)
+                return
+            try:
+                connect_started = time.monotonic()
+                server_sock = self.connect_to_target()
+                if server_sock is None:
+                    close_reason = "no_target"
+                    client_sock.close()
+                    self.logger.append_output("Proxy: Could not get WSL IP.\n", "red")
+                    return
+                stats.record_connect(time.monotonic() - connect_started)
+            except Exception as e:
+                close_reason = "connect_failed"
+                self.logger.append_output(f"Proxy: Error connecting to target: {e}\n", "red")
+                client_sock.close()
+                return
+
+            client_sock.settimeout(self.idle_timeout or None)
+            close_reason = self.relay_raw(client_sock, server_sock, stats)
+        finally:
+            self.metrics.close_connection(stats, close_reason)
+
+    def connection_deadline(self, stats):
+        return stats.started + self.total_timeout if self.total_timeout else None
+
+    def relay_raw(self, client_sock, server_sock, stats):
+        """Relay raw bytes until either side closes or times out; returns the close reason."""
+        try:
+            return relay_sockets(
+                client_sock,
+                server_sock,
+                self.relay_chunk_size,
+                stats=stats,
+                idle_timeout=self.idle_timeout or None,
+                deadline=self.connection_deadline(stats)
+            )
+        except socket.timeout:
+            return "idle_timeout"
+        except Exception as e:
+            # self.logger.append_output(f"Proxy relay error: {e}\n", "red")
+            return "error"
+        finally:
+            client_sock.close()
+            server_sock.close()
+
+    def handle_http_client(self, client_sock, stats):
+        """HTTP-aware relay: forward one request at a time over pooled upstream sockets.
+
+        Returns the close reason for the connection metrics.
+        """
+        client_sock.settimeout(self.idle_timeout or None)
+        client = HttpMessageReader(client_sock)
+        deadline = self.connection_deadline(stats)
+        close_reason = "shutdown"
+        try:
+            while not self.should_stop.is_set():
+                if deadline is not None and time.monotonic() >= deadline:
+                    close_reason = "total_timeout"
+                    break
+                head = client.read_head()
+                if head is None:
+                    close_reason = "client_closed"
+                    break
+                request_line, headers, raw_head = head
+                parts = request_line.split(" ")
+                method = parts[0].upper()
+                version = parts[-1].upper() if len(parts) >= 3 else "HTTP/1.0"
+
+                if method == "CONNECT" or _http_header_value(headers, "upgrade"):
+                    # Tunnels and protocol upgrades are not request/response; relay raw bytes
+                    connect_started = time.monotonic()
+                    server_sock = self.connect_to_target()
+                    if server_sock is None:
+                        client_sock.sendall(_http_simple_response("502 Bad Gateway", "WSL IP not available"))
+                        close_reason = "no_target"
+                        break
+                    stats.record_connect(time.monotonic() - connect_started)
+                    tunnel_head = raw_head + bytes(client.buffer)
+                    server_sock.sendall(tunnel_head)
+                    stats.record_up(len(tunnel_head))
+                    client.buffer.clear()
+                    return self.relay_raw(client_sock, server_sock, stats)
+
+                try:
+                    framing = _http_body_framing(headers)
+                except HttpFramingError as e:
+                    # Upstream sockets are pooled across clients, so an ambiguous body is never forwarded
+                    client_sock.sendall(_http_simple_response("400 Bad Request", str(e)))
+                    close_reason = "bad_request"
+                    break
+
+                forward_headers = []
+                expects_continue = False
+                for name, value in headers:
+                    lowered = name.lower()
+                    if lowered == "expect" and value.lower() == "100-continue":
+                        expects_continue = True
+                        continue
+                    # Hop-by-hop: the upstream socket's lifetime is ours to manage, not the client's
+                    if lowered in ("connection", "keep-alive", "proxy-connection"):
+                        continue
+                    # Re-sent below as the one length the body was read with
+                    if lowered == "content-length":
+                        continue
+                    forward_headers.append((name, value))
+                if framing[0] == "length":
+                    forward_headers.append(("Content-Length", str(framing[1])))
+                if version == "HTTP/1.0":
+                    forward_headers.append(("Connection", "keep-alive"))
+                if expects_continue:
+                    client_sock.sendall(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+                try:
+                    if framing[0] == "length" and framing[1] > self.max_request_body:
+                        client_sock.sendall(_http_simple_response("413 Payload Too Large", "Request body too large"))
+                        close_reason = "request_too_large"
+                        break
+                    body = bytearray()
+                    for chunk in client.iter_body(framing):
+                        body += chunk
+                        if len(body) > self.max_request_body:
+                            raise ValueError("Request body too large")
+                except HttpFramingError as e:
+                    client_sock.sendall(_http_simple_response("400 Bad Request", str(e)))
+                    close_reason = "bad_request"
+                    break
+
+                forwarded_head = request_line + "\r\n" + "".join(
+                    f"{name}: {value}\r\n" for name, value in forward_headers
+                ) + "\r\n"
+                request_bytes = forwarded_head.encode("latin-1") + bytes(body)
+
+                forward_close_reason = self.forward_http_request(client_sock, request_bytes, method, stats, deadline)
+                if forward_close_reason:
+                    close_reason = forward_close_reason
+                    break
+                if not _http_keep_alive(version, headers):
+                    close_reason = "client_closed"
+                    break
+        except socket.timeout:
+            close_reason = "idle_timeout"
+        except Exception:
+            close_reason = "error"
+        finally:
+            client_sock.close()
+        return close_reason
+
+    def forward_http_request(self, client_sock, request_bytes, method, stats, deadline=None):
+        """Send one buffered request upstream and stream the response back.
+
+        Returns None if the exchange completed cleanly and the client connection
+        can carry another request, otherwise the reason it has to be closed.
+        """
+        target_addr = self.target_addr_func()
+        if not target_addr[0]:
+            client_sock.sendall(_http_simple_response("502 Bad Gateway", "WSL IP not available"))
+            self.logger.append_output("Proxy: Could not get WSL IP.\n", "red")
+            return "no_target"
+
+        for attempt in range(2):
+            upstream = self.upstream_pool.acquire(target_addr)
+            reused = upstream is not None
+            if upstream is None:
+                try:
+                    connect_started = time.monotonic()
+                    upstream = self.connect_to_target()
+                    if upstream is not None:
+                        stats.record_connect(time.monotonic() - connect_started)
+                except Exception as e:
+                    self.logger.append_output(f"Proxy: Error connecting to target: {e}\n", "red")
+                    upstream = None
+                if upstream is None:
+                    client_sock.sendall(_http_simple_response("502 Bad Gateway", "Could not reach DwemerDistro"))
+                    return "connect_failed"
+                self.upstream_pool.record_created()
+                target_addr = upstream.getpeername()[:2]
+            upstream_reader = HttpMessageReader(upstream)
+            try:
+                upstream.sendall(request_bytes)
+                stats.record_up(len(request_bytes))
+                response_head = upstream_reader.read_head()
+                if response_head is None:
+                    raise ConnectionError("Upstream closed the connection")
+                break
+            except socket.timeout:
+                self.upstream_pool.discard(upstream)
+                client_sock.sendall(_http_simple_response("504 Gateway Timeout", "DwemerDistro did not respond"))
+                return "idle_timeout"
+            except (OSError, ConnectionError):
+                self.upstream_pool.discard(upstream)
+                # Nothing reached the client yet, so a stale pooled socket is safe to retry
+                if reused and attempt == 0:
+                    continue
+                client_sock.sendall(_http_simple_response("502 Bad Gateway", "DwemerDistro closed the connection"))
+                return "upstream_closed"
+
+        try:
+            status_line, response_headers, raw_head = response_head
+            status = int(status_line.split(" ")[1])
+            # Relay interim responses (100 Continue, 103 Early Hints) until the final one
+            while 100 <= status < 200 and status != 101:
+                client_sock.sendall(raw_head)
+                stats.record_down(len(raw_head))
+                response_head = upstream_reader.read_head()
+                if response_head is None:
+                    raise ConnectionError("Upstream closed the connection")
+                status_line, response_headers, raw_head = response_head
+                status = int(status_line.split(" ")[1])
+
+            try:
+                framing = _http_body_framing(response_headers, request_method=method, status=status)
+            except HttpFramingError:
+                # Nothing of this response reached the client yet, so it can still get a clean error
+                self.upstream_pool.discard(upstream)
+                client_sock.sendall(_http_simple_response("502 Bad Gateway", "DwemerDistro sent an invalid response"))
+                return "upstream_closed"
+            client_sock.sendall(raw_head)
+            stats.record_down(len(raw_head))
+            for chunk in upstream_reader.iter_body(framing):
+                client_sock.sendall(chunk)
+                stats.record_down(len(chunk))
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.upstream_pool.discard(upstream)
+                    return "total_timeout"
+        except socket.timeout:
+            self.upstream_pool.discard(upstream)
+            return "idle_timeout"
+        except Exception:
+            self.upstream_pool.discard(upstream)
+            return "upstream_closed"
+
+        response_version = status_line.split(" ")[0].upper()
+        reusable = (
+            framing[0] != "close"
+            and status != 101
+            and not upstream_reader.buffer
+            and _http_keep_alive(response_version, response_headers)
+        )
+        if reusable:
+            self.upstream_pool.release(target_addr, upstream)
+        else:
+            self.upstream_pool.discard(upstream)
+        # A body delimited by close can only be ended by closing the client too
+        if framing[0] == "close" or status == 101:
+            return "upstream_closed"
+        return None
+
+    def shutdown(self):
+        self.should_stop.set()
+        if self.upstream_pool is not None:
+            self.upstream_pool.clear()
+        # Dummy connection to exit the accept()
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(self.listen_addr)
+        except:
+            pass
+
+
+class AsyncTCPProxy(threading.Thread):
+    """asyncio-based proxy engine: one event loop relays every connection.
+
+    Drop-in alternative to SimpleTCPProxy with the same constructor, target
+    resolution and shutdown() semantics, without a thread per connection.
+    """
+    relay_chunk_size = 65536
+
+    def __init__(
+        self,
+        listen_addr,
+        target_addr_func,
+        logger,
+        on_connect_error=None,
+        metrics=None,
+        max_connections=32,
+        accept_queue_depth=64,
+        idle_timeout=60,
+        total_timeout=600,
+        route_name=None,
+    ):
+        super().__init__(daemon=True)
+        self.listen_addr = listen_addr  # e.g., ('127.0.0.1', 7513)
+        self.target_addr_func = target_addr_func  # function that returns ('wsl_ip', 8081)
+        self.logger = logger  # any object with append_output(text, tag=None)
+        self.on_connect_error = on_connect_error  # called before retrying a failed connect once
+        self.metrics = metrics if metrics is not None else ProxyMetrics()
+        self.max_connections = max_connections  # connections relayed at once
+        self.accept_queue_depth = accept_queue_depth  # accepted connections allowed to wait for a slot
+        self.idle_timeout = idle_timeout  # seconds without traffic before a connection is dropped
+        self.total_timeout = total_timeout  # upper bound on a connection's lifetime, queue time included
+        self.route_name = route_name  # PROXY_ROUTES entry served by this listener, for logs and metrics
+        self.should_stop = threading.Event()
+        self.loop = None
+        self.stopped = None
+        self.slots = None
+        self.waiting = 0
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.serve())
+        except Exception as e:
+            self.logger.append_output(f"Proxy Error: {e}\n", "red")
+        finally:
+            # Cancel relays still in flight so their sockets are closed
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+        route_text = f" ({self.route_name})" if self.route_name else ""
+        self.logger.append_output(f"TCP Proxy stopped{route_text}.\n")
+
+    async def serve(self):
+        self.stopped = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.max_connections)
+        server = await asyncio.start_server(
+            self.handle_client,
+            self.listen_addr[0],
+            self.listen_addr[1],
+            reuse_address=True,
+            backlog=self.accept_queue_depth
+        )
+        route_text = f"{self.route_name}, " if self.route_name else ""
+        self.logger.append_output(f"TCP Proxy listening on {self.listen_addr[0]}:{self.listen_addr[1]} ({route_text}asyncio)\n")
+        try:
+            if not self.should_stop.is_set():
+                await self.stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    async def connect_to_target(self):
+        """Connect to the target, retrying once on a fresh lookup if the cached IP is stale."""
+        attempts = 2 if self.on_connect_error else 1
+        for attempt in range(attempts):
+            # Resolution may spawn wsl.exe on a cache miss, so keep it off the loop
+            target_ip, target_port = await self.loop.run_in_executor(None, self.target_addr_func)
+            if not target_ip:
+                return None
+            try:
+                return await asyncio.wait_for(asyncio.open_connection(target_ip, target_port), self.idle_timeout or None)
+            except OSError:
+                if attempt + 1 >= attempts:
+                    raise
+                self.on_connect_error()
+        return None
+
+    async def handle_client(self, client_reader, client_writer):
+        stats = self.metrics.open_connection(client_writer.get_extra_info("peername"), self.route_name)
+        close_reason = "error"
+        try:
+            if self.slots.locked():
+                if self.waiting >= self.accept_queue_depth:
+                    client_writer.write(PROXY_BUSY_RESPONSE)
+                    client_writer.close()
+                    close_reason = "rejected"
+                    return
+                self.metrics.record_queued()
+                self.waiting += 1
+                try:
+                    await self.slots.acquire()
+                finally:
+                    self.waiting -= 1
+            else:
+                await self.slots.acquire()
+            try:
+                close_reason = await self.relay_client(client_reader, client_writer, stats)
+            finally:
+                self.slots.release()
+        except asyncio.CancelledError:
+            client_writer.close()
+            close_reason = "shutdown"
+        finally:
+            self.metrics.close_connection(stats, close_reason)
+
+    async def relay_client(self, client_reader, client_writer, stats):
+        try:
+            connect_started = time.monotonic()
+            upstream = await self.connect_to_target()
+            if upstream is None:
+                client_writer.close()
+                self.logger.append_output("Proxy: Could not get WSL IP.\n", "red")
+                return "no_target"
+            stats.record_connect(time.monotonic() - connect_started)
+        except asyncio.CancelledError:
+            client_writer.close()
+            return "shutdown"
+        except asyncio.TimeoutError:
+            self.logger.append_output("Proxy: Timed out connecting to target.\n", "red")
+            client_writer.close()
+            return "connect_failed"
+        except Exception as e:
+            self.logger.append_output(f"Proxy: Error connecting to target: {e}\n", "red")
+            client_writer.close()
+            return "connect_failed"
+
+        server_reader, server_writer = upstream
+        last_activity = [time.monotonic()]
+        def record_up(count):
+            last_activity[0] = time.monotonic()
+            stats.record_up(count)
+        def record_down(count):
+            last_activity[0] = time.monotonic()
+            stats.record_down(count)
+        upstream_relay = asyncio.ensure_future(self.pipe(client_reader, server_writer, record_up))
+        downstream_relay = asyncio.ensure_future(self.pipe(server_reader, client_writer, record_down))
+        relays = [upstream_relay, downstream_relay]
+        deadline = stats.started + self.total_timeout if self.total_timeout else None
+        close_reason = "error"
+        try:
+            while True:
+                # Idle time is shared by both directions, so it is checked here rather than per read
+                wait = None
+                now = time.monotonic()
+                if deadline is not None:
+                    if now >= deadline:
+                        close_reason = "total_timeout"
+                        break
+                    wait = deadline - now
+                if self.idle_timeout:
+                    idle_left = last_activity[0] + self.idle_timeout - now
+                    if idle_left <= 0:
+                        close_reason = "idle_timeout"
+                        break
+                    wait = idle_left if wait is None else min(wait, idle_left)
+                # Like the threaded engine, EOF on either side ends the whole relay
+                done, _ = await asyncio.wait(relays, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if done:
+                    close_reason = "client_closed" if upstream_relay in done else "upstream_closed"
+                    break
+        except asyncio.CancelledError:
+            close_reason = "shutdown"
+        finally:
+            for relay in relays:
+                relay.cancel()
+            client_writer.close()
+            server_writer.close()
+        return close_reason
+
+    async def pipe(self, reader, writer, record=None):
+        try:
+            while True:
+                data = await reader.read(self.relay_chunk_size)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+                if record:
+                    record(len(data))
+        except (ConnectionError, OSError):
+            pass
+
+    def shutdown(self):
+        self.should_stop.set()
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._request_stop)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def _request_stop(self):
+        if self.stopped is not None:
+            self.stopped.set()
+
+
+# Relay engines selectable with --proxy-engine
+PROXY_ENGINES = {
+    "thread": SimpleTCPProxy,
+    "asyncio": AsyncTCPProxy,
+}
+
+# Local proxy listeners; every route shares one WSL IP resolver and one ProxyMetrics
+PROXY_ROUTES = [
+    {"name": "herika", "display_name": "HerikaServer", "listen_port": 7513, "target_port": 8081},
+    {"name": "stobe", "display_name": "StobeServer", "listen_port": 7514, "target_port": 8083},
+]
+
+
+# Services inside WSL checked by HealthProbe; required ones gate /ready
+HEALTH_COMPONENTS = [
+    {"name": "herikaserver", "port": 8081, "required": True},
+    {"name": "stobeserver", "port": 8083, "required": False},
+    {"name": "tts", "port": 8020, "required": False},  # XTTS, Chatterbox and PockeTTS share 8020
+]
+
+
+class HealthProbe(threading.Thread):
+    """Periodically checks TCP reachability of the WSL services and caches the result.
+
+    /health and /ready read the cached results, so any number of clients can
+    poll them without opening connections to the distro themselves.
+    """
+    def __init__(self, ip_provider, components=None, interval=5, connect_timeout=0.5):
+        super().__init__(daemon=True)
+        self.ip_provider = ip_provider  # function that returns the known WSL IP or None, without blocking
+        self.components = components if components is not None else HEALTH_COMPONENTS
+        self.interval = interval
+        self.connect_timeout = connect_timeout
+        self.stop_event = threading.Event()
+        self.results = {}  # component name -> last probe result, swapped whole after each round
+        self.checked_at = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.probe_once()
+            self.stop_event.wait(self.interval)
+
+    def probe_once(self):
+        wsl_ip = self.ip_provider()
+        results = {}
+        for component in self.components:
+            result = {
+                "port": component["port"],
+                "required": component["required"],
+                "reachable": False,
+                "connect_ms": None,
+                "error": None,
+            }
+            if not wsl_ip:
+                result["error"] = "WSL IP not known"
+            else:
+                start = time.perf_counter()
+                try:
+                    with socket.create_connection((wsl_ip, component["port"]), timeout=self.connect_timeout):
+                        result["reachable"] = True
+                        result["connect_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                except OSError as e:
+                    result["error"] = str(e) or e.__class__.__name__
+            results[component["name"]] = result
+        self.results = results
+        self.checked_at = time.time()
+
+    def ready(self):
+        """True once every required component answered the last probe."""
+        results = self.results
+        return bool(results) and all(r["reachable"] for r in results.values() if r["required"])
+
+    def snapshot(self):
+        checked_at = self.checked_at
+        return {
+            "checked_at": datetime.datetime.fromtimestamp(checked_at).isoformat(timespec="seconds") if checked_at else None,
+            "age_s": round(time.time() - checked_at, 1) if checked_at else None,
+            "components": self.results,
+        }
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# Game name in /discover?game=... -> server port inside WSL (unknown games get HerikaServer)
+DISCOVERY_GAME_PORTS = {
+    "skyrim": 8081,
+    "kenshi": 8083,
+    "stobe": 8083,
+}
+DISCOVERY_WATCH_TIMEOUT = 30  # default /discover/watch long-poll, in seconds
+DISCOVERY_WATCH_MAX_TIMEOUT = 300
+DISCOVERY_SSE_HEARTBEAT = 15  # seconds between comment lines on an idle event stream
+
+
+def _etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value lists etag (weak comparison) or is *."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def _render_discovery_response(body_text, proxy_addr=None):
+    """Pre-encode a /discover 200 and its 304, minus the blank line ending the head.
+
+    proxy_addr is the local proxy listener for the game, sent as X-Proxy-Address.
+    """
+    body = body_text.encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+    common = f"ETag: {etag}\r\nCache-Control: no-cache\r\n"
+    if proxy_addr:
+        common += f"X-Proxy-Address: {proxy_addr}\r\n"
+    ok_head = (
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/plain\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"{common}"
+    ).encode("ascii")
+    not_modified_head = f"HTTP/1.1 304 Not Modified\r\n{common}".encode("ascii")
+    return etag, ok_head, not_modified_head, body
+
+
+class DiscoveryRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP/1.1 handler for the discovery port.
+
+    BaseHTTPRequestHandler reads requests from a buffered rfile, so partial reads
+    and pipelined requests on a keep-alive connection are handled in order.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    timeout = 5  # idle keep-alive connections give their worker back after this many seconds
+
+    def do_GET(self):
+        self.handle_route(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_route(send_body=False)
+
+    def do_POST(self):
+        self.send_method_not_allowed()
+
+    do_PUT = do_POST
+    do_DELETE = do_POST
+    do_PATCH = do_POST
+
+    def handle_route(self, send_body):
+        discovery = self.server.discovery
+        game = discovery.discover_paths.get(self.path)
+        if game is not None:
+            self.send_discovery(discovery, game, send_body)
+            return
+        parsed_url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(parsed_url.query)
+        # Backward compatible default remains skyrim.
+        game = params.get("game", ["skyrim"])[0].strip().lower()
+        if game not in DISCOVERY_GAME_PORTS:
+            game = "skyrim"
+        if parsed_url.path == "/discover":
+            self.send_discovery(discovery, game, send_body)
+        elif parsed_url.path == "/discover/watch":
+            if not self.server.begin_long_request():
+                self.send_body(503, "text/plain", "Too many watchers", send_body, {"Retry-After": "5"})
+                return
+            try:
+                if "text/event-stream" in (self.headers.get("Accept") or ""):
+                    self.stream_discovery(discovery, game)
+                else:
+                    try:
+                        timeout = float(params.get("timeout", [DISCOVERY_WATCH_TIMEOUT])[0])
+                    except ValueError:
+                        timeout = DISCOVERY_WATCH_TIMEOUT
+                    self.long_poll_discovery(discovery, game, min(max(timeout, 0), DISCOVERY_WATCH_MAX_TIMEOUT), send_body)
+            finally:
+                self.server.end_long_request()
+        elif parsed_url.path == "/metrics" and discovery.metrics_provider:
+            self.send_body(200, "application/json", json.dumps(discovery.metrics_provider(), indent=2), send_body)
+        elif parsed_url.path in ("/health", "/ready") and discovery.health_provider:
+            ready, health = discovery.health_provider()
+            # /health answers whenever the launcher is up; /ready only once the server can take requests
+            status = 200 if ready or parsed_url.path == "/health" else 503
+            self.send_body(status, "application/json", json.dumps(health, indent=2), send_body)
+        else:
+            self.send_body(404, "text/plain", "Not Found", send_body)
+
+    def send_discovery(self, discovery, game, send_body):
+        rendered = discovery.responses.get(game)
+        if rendered is None:
+            # No IP published yet: ask the provider once, which also renders the responses
+            wsl_ip = discovery.ip_provider()
+            if wsl_ip:
+                discovery.update_wsl_ip(wsl_ip)
+                rendered = discovery.responses.get(game)
+        if rendered is None:
+            self.send_body(503, "text/plain", "WSL IP not available", send_body, {"Retry-After": "5"})
+            return
+
+        etag, ok_head, not_modified_head, body = rendered
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            self.write_rendered(not_modified_head, b"", send_body)
+        else:
+            self.write_rendered(ok_head, body, send_body)
+
+    def long_poll_discovery(self, discovery, game, timeout, send_body):
+        """Answer once the game's target differs from If-None-Match, or 304 after timeout seconds."""
+        if_none_match = self.headers.get("If-None-Match") or ""
+        changed, rendered = discovery.wait_for_change(
+            game, lambda etag: etag is not None and not _etag_matches(if_none_match, etag), timeout
+        )
+        if rendered is None:
+            self.send_body(503, "text/plain", "WSL IP not available", send_body, {"Retry-After": "5"})
+        elif changed:
+            self.write_rendered(rendered[1], rendered[3], send_body)
+        else:
+            self.write_rendered(rendered[2], b"", send_body)
+
+    def stream_discovery(self, discovery, game):
+        """Server-sent events: a `discover` event per target change, `unavailable` while WSL has no IP."""
+        self.close_connection = True
+        self.wfile.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n"
+            b"\r\n"
+        )
+        rendered = discovery.responses.get(game)
+        sent_etag = ""  # ETag of the last event sent, None once `unavailable` was sent
+        while not discovery.stopping:
+            etag = rendered[0] if rendered else None
+            if etag == sent_etag:
+                event = b": ping\n\n"  # heartbeat; also how a closed client is noticed
+            elif rendered:
+                event = b"event: discover\nid: " + etag.strip('"').encode("ascii") + b"\ndata: " + rendered[3] + b"\n\n"
+            else:
+                event = b"event: unavailable\ndata: WSL IP not available\n\n"
+            sent_etag = etag
+            self.wfile.write(event)
+            _changed, rendered = discovery.wait_for_change(game, lambda etag: etag != sent_etag, DISCOVERY_SSE_HEARTBEAT)
+
+    def write_rendered(self, head, body, send_body):
+        if self.server.pending.qsize():
+            # Other clients are waiting for a worker; don't hold this one open for keep-alive
+            self.close_connection = True
+            head += b"Connection: close\r\n"
+        self.wfile.write(head + b"\r\n" + body if send_body else head + b"\r\n")
+
+    def send_method_not_allowed(self):
+        # Drain the body so the next pipelined request starts at a message boundary
+        length = self.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) <= 65536:
+            self.rfile.read(int(length))
+        else:
+            self.close_connection = True
+        self.send_body(405, "text/plain", "Method Not Allowed", True, {"Allow": "GET, HEAD"})
+
+    def send_body(self, status, content_type, body, send_body=True, extra_headers=None):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        if self.server.pending.qsize():
+            # Other clients are waiting for a worker; don't hold this one open for keep-alive
+            self.close_connection = True
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Discovery polls are too frequent to log
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTPServer that hands accepted connections to a fixed pool of worker threads."""
+    allow_reuse_address = True
+    request_queue_size = 64
+
+    def __init__(self, server_address, handler_class, workers=8, max_long_requests=16):
+        super().__init__(server_address, handler_class)
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker_count = workers
+        self.max_long_requests = max_long_requests
+        self.long_requests = 0
+        for _ in range(workers):
+            threading.Thread(target=self.worker, daemon=True).start()
+
+    def process_request(self, request, client_address):
+        self.pending.put((request, client_address))
+
+    def begin_long_request(self):
+        """Called by a handler about to block; starts a stand-in worker so short requests keep flowing."""
+        with self.lock:
+            if self.long_requests >= self.max_long_requests:
+                return False
+            self.long_requests += 1
+            self.worker_count += 1
+        threading.Thread(target=self.worker, daemon=True).start()
+        return True
+
+    def end_long_request(self):
+        with self.lock:
+            self.long_requests -= 1
+            self.worker_count -= 1
+        self.pending.put(None)  # retire one worker
+
+    def worker(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                pass  # Silent fail for discovery requests
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        with self.lock:
+            worker_count = self.worker_count
+        for _ in range(worker_count):
+            self.pending.put(None)
+
+
+class DiscoveryHTTPServer(threading.Thread):
+    """HTTP/1.1 server for auto-discovery on port 7135, served by a small worker pool.
+
+    /discover responses are pre-encoded per game and only rebuilt when
+    update_wsl_ip() reports a new IP (it is a WslIpWatcher subscriber), so a
+    poll is a dictionary lookup plus one write.
+    """
+    def __init__(self, logger, ip_provider, metrics_provider=None, host='127.0.0.1', port=7135, workers=8, health_provider=None, proxy_addrs=None):
+        super().__init__(daemon=True)
+        self.logger = logger  # any object with append_output(text, tag=None)
+        self.ip_provider = ip_provider  # non-blocking function that returns the WSL IP or None, used until one is published
+        self.metrics_provider = metrics_provider  # function that returns the /metrics JSON payload
+        self.health_provider = health_provider  # function that returns (ready, /health JSON payload)
+        self.proxy_addrs = proxy_addrs or {}  # game -> "host:port" of the running local proxy for its server
+        self.host = host
+        self.port = port
+        self.responses = {}  # game -> (etag, 200 head, 304 head, body); swapped whole on IP change
+        self.changed = threading.Condition()  # notified on every responses swap, wakes /discover/watch
+        self.stopping = False
+        # Request targets the plugins send, mapped straight to a game without parsing
+        self.discover_paths = {"/discover": "skyrim"}
+        for game in DISCOVERY_GAME_PORTS:
+            self.discover_paths[f"/discover?game={game}"] = game
+        # Bind now so a port conflict surfaces to the caller instead of inside the thread
+        self.httpd = PooledHTTPServer((host, port), DiscoveryRequestHandler, workers)
+        self.httpd.discovery = self
+
+    def run(self):
+        self.logger.append_output(f"Discovery service listening on {self.host}:{self.port}\n")
+        try:
+            self.httpd.serve_forever(poll_interval=0.5)
+        except Exception as e:
+            self.logger.append_output(f"Discovery service error: {e}\n", "red")
+        finally:
+            self.httpd.server_close()
+            self.logger.append_output("Discovery service stopped.\n")
+
+    def update_wsl_ip(self, new_ip, old_ip=None):
+        """Re-render the per-game /discover responses for new_ip (None clears them)."""
+        responses = {}
+        if new_ip:
+            responses = {
+                game: _render_discovery_response(f"{new_ip}:{target_port}", self.proxy_addrs.get(game))
+                for game, target_port in DISCOVERY_GAME_PORTS.items()
+            }
+        with self.changed:
+            self.responses = responses
+            self.changed.notify_all()
+
+    def wait_for_change(self, game, is_new, timeout):
+        """Block until is_new(etag) holds for the game's current ETag (None while there is no IP).
+
+        Returns (changed, rendered): changed is False after timeout or shutdown, and
+        rendered is the game's current pre-encoded response or None.
+        """
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                rendered = self.responses.get(game)
+                if is_new(rendered[0] if rendered else None):
+                    return True, rendered
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.stopping:
+                    return False, rendered
+                self.changed.wait(remaining)
+
+    def shutdown(self):
+        with self.changed:
+            self.stopping = True
+            self.changed.notify_all()
+        if self.is_alive():
+            self.httpd.shutdown()
+        else:
+            self.httpd.server_close()
+
+
+def hidden_window_kwargs():
+    """startupinfo/creationflags that keep wsl.exe from flashing a console window."""
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = 0  # SW_HIDE
+    return {"startupinfo": startupinfo, "creationflags": subprocess.CREATE_NO_WINDOW}
+
+
+def query_wsl_ip(distro=WSL_DISTRO_NAME):
+    """Run `hostname -I` in the distro and return its first address, or None.
+
+    Raises FileNotFoundError when wsl.exe is missing and CalledProcessError when
+    the command fails, so callers can report each case.
+    """
+    result = subprocess.run(
+        ["wsl", "-d", distro, "hostname", "-I"],
+        capture_output=True,
+        text=True,
+        check=True,
+        **hidden_window_kwargs()
+    )
+    addresses = result.stdout.strip().split()
+    return addresses[0] if addresses else None
+
+
+class WslShellSession:
+    """One long-lived `bash -l` in the distro that runs commands sent over stdin.
+
+    Spawning wsl.exe costs 100-500 ms on Windows, so small queries share this
+    co-process instead. Each command is framed by a random sentinel:
+
+        ( eval "$(cat <<'__chim_<token>'          the command, verbatim
+        ...
+        __chim_<token>
+        )" ) </dev/null
+        printf '\\n<sentinel> %d\\n' $?            end of stdout plus exit code
+        printf '\\n<sentinel>\\n' >&2              end of stderr
+
+    The subshell keeps `cd`, variables and `exit` from leaking into the session,
+    and </dev/null keeps a command from reading the protocol stream. Commands
+    run one at a time. A command that times out kills the session, and the next
+    run() starts a fresh one.
+    """
+    def __init__(self, distro=WSL_DISTRO_NAME, user=None, start_timeout=60):
+        self.distro = distro
+        self.user = user  # None runs as the distro's default user
+        self.start_timeout = start_timeout
+        self.lock = threading.Lock()  # one command in flight per session
+        self.condition = threading.Condition()  # guards the output buffers below
+        self.process = None
+        self.stdout_buffer = bytearray()
+        self.stderr_buffer = bytearray()
+        self.stdout_closed = False
+        self.stderr_closed = False
+        self.commands_run = 0
+        self.restarts = 0
+        self.pending = 0  # run() calls holding or waiting for the session, tracked by WslSessionBackend
+        self.last_used = time.monotonic()
+
+    def command_args(self):
+        args = ["wsl", "-d", self.distro]
+        if self.user:
+            args += ["-u", self.user]
+        return args + ["--", "bash", "-l"]
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command_args(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **hidden_window_kwargs()
+        )
+        with self.condition:
+            self.stdout_buffer = bytearray()
+            self.stderr_buffer = bytearray()
+            self.stdout_closed = False
+            self.stderr_closed = False
+        threading.Thread(target=self.pump, args=(self.process, "stdout"), daemon=True).start()
+        threading.Thread(target=self.pump, args=(self.process, "stderr"), daemon=True).start()
+        self.restarts += 1
+
+        # Login scripts may print before the first command; drop everything up to a handshake marker
+        marker = f"__chim_ready_{os.urandom(8).hex()}"
+        self.send(f"printf '%s\\n' {marker}\n")
+        try:
+            self.wait_for(lambda: self.take_through(self.stdout_buffer, f"{marker}\n".encode()), self.start_timeout)
+        except subprocess.TimeoutExpired:
+            # A late handshake would otherwise be read as the next command's output
+            process, self.process = self.process, None
+            process.kill()
+            raise
+        with self.condition:
+            self.stderr_buffer.clear()
+
+    def pump(self, process, name):
+        """Reader thread: move everything the co-process writes into the matching buffer."""
+        stream = process.stdout if name == "stdout" else process.stderr
+        read = getattr(stream, "read1", stream.read)
+        while True:
+            try:
+                data = read(65536)
+            except (OSError, ValueError):
+                data = b""
+            with self.condition:
+                if process is not self.process:
+                    return  # a restarted session owns the buffers now
+                if data:
+                    (self.stdout_buffer if name == "stdout" else self.stderr_buffer).extend(data)
+                elif name == "stdout":
+                    self.stdout_closed = True
+                else:
+                    self.stderr_closed = True
+                self.condition.notify_all()
+            if not data:
+                return
+
+    def send(self, text):
+        self.process.stdin.write(text.encode("utf-8"))
+        self.process.stdin.flush()
+
+    @staticmethod
+    def take_through(buffer, marker):
+        """Remove and return buffer contents up to and including marker, or None if absent."""
+        index = buffer.find(marker)
+        if index < 0:
+            return None
+        taken = bytes(buffer[:index + len(marker)])
+        del buffer[:index + len(marker)]
+        return taken
+
+    def wait_for(self, take, timeout):
+        """Wait until take() returns a value. Raises TimeoutExpired, or EOFError if the session died."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                value = take()
+                if value is not None:
+                    return value
+                if self.stdout_closed and self.stderr_closed:
+                    raise EOFError("WSL shell session exited")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.command_args(), timeout)
+                self.condition.wait(remaining)
+
+    def run(self, command, timeout=None):
+        """Run a bash command and return a CompletedProcess like subprocess.run(capture_output=True, text=True)."""
+        with self.lock:
+            for attempt in range(2):
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+                sentinel = f"__chim_{os.urandom(8).hex()}"
+                try:
+                    self.send(
+                        f"( eval \"$(cat <<'{sentinel}'\n{command}\n{sentinel}\n)\" ) </dev/null\n"
+                        f"printf '\\n%s %d\\n' {sentinel} $?\n"
+                        f"printf '\\n%s\\n' {sentinel} >&2\n"
+                    )
+                except OSError:
+                    # The session died while idle (e.g. the distro was terminated); retry once on a fresh one
+                    self.close()
+                    if attempt:
+                        raise
+                    continue
+                stdout_marker = f"\n{sentinel} ".encode()
+                try:
+                    stdout = self.wait_for(lambda: self.take_through(self.stdout_buffer, stdout_marker), timeout)
+                    status = self.wait_for(lambda: self.take_through(self.stdout_buffer, b"\n"), timeout)
+                    stderr = self.wait_for(
+                        lambda: self.take_through(self.stderr_buffer, f"\n{sentinel}\n".encode()), timeout
+                    )
+                except EOFError:
+                    # Died mid-command: report it like a killed process rather than running the command twice
+                    self.close()
+                    return subprocess.CompletedProcess(command, -1, "", "WSL shell session exited\n")
+                except subprocess.TimeoutExpired:
+                    # The command may still be running and would corrupt the framing; start over next time
+                    self.close()
+                    raise subprocess.TimeoutExpired(command, timeout)
+                self.commands_run += 1
+                return subprocess.CompletedProcess(
+                    command,
+                    int(status.strip() or -1),
+                    stdout[:-len(stdout_marker)].decode("utf-8", errors="replace"),
+                    stderr[:-len(sentinel) - 2].decode("utf-8", errors="replace"),
+                )
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+
+
+class WslSessionBackend:
+    """Default WslExecutor backend: WslShellSessions per user, closed once idle.
+
+    Each user gets one session, plus at most one overflow session while the
+    first is busy (e.g. with a long git fetch); further commands queue on the
+    least busy one. A session unused for idle_timeout seconds is closed, so
+    the startup queries do not keep wsl.exe children alive for the whole
+    launcher session.
+    """
+    def __init__(self, distro=WSL_DISTRO_NAME, max_sessions_per_user=2, idle_timeout=120):
+        self.distro = distro
+        self.max_sessions_per_user = max_sessions_per_user
+        self.idle_timeout = idle_timeout
+        self.condition = threading.Condition()  # guards sessions and wakes the reaper
+        self.sessions = {}  # user -> [WslShellSession]
+        self.reaper = None
+
+    def run(self, command, user=None, timeout=None):
+        with self.condition:
+            sessions = self.sessions.setdefault(user, [])
+            session = min(sessions, key=lambda candidate: candidate.pending) if sessions else None
+            if session is None or (session.pending and len(sessions) < self.max_sessions_per_user):
+                session = WslShellSession(self.distro, user)
+                sessions.append(session)
+            session.pending += 1
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=self.reap, daemon=True)
+                self.reaper.start()
+        try:
+            return session.run(command, timeout=timeout)
+        finally:
+            with self.condition:
+                session.pending -= 1
+                session.last_used = time.monotonic()
+                self.condition.notify_all()
+
+    def take_sessions(self, expired_before=None):
+        """Remove and return idle sessions, only those unused since expired_before when given (holds condition)."""
+        taken = []
+        for user, sessions in list(self.sessions.items()):
+            for session in list(sessions):
+                if session.pending or (expired_before is not None and session.last_used > expired_before):
+                    continue
+                sessions.remove(session)
+                taken.append(session)
+            if not sessions:
+                del self.sessions[user]
+        return taken
+
+    def reap(self):
+        """Reaper thread: close sessions that sat idle for idle_timeout seconds."""
+        while True:
+            with self.condition:
+                expired = self.take_sessions(expired_before=time.monotonic() - self.idle_timeout)
+                if not expired:
+                    last_used = [s.last_used for sessions in self.sessions.values() for s in sessions if not s.pending]
+                    # Busy sessions notify when they finish, which re-arms the wait
+                    wait = min(last_used) + self.idle_timeout - time.monotonic() if last_used else None
+                    self.condition.wait(None if wait is None else max(wait, 0.1))
+            for session in expired:
+                session.close()
+
+    def close(self):
+        """Close every idle session now; busy ones finish their command and are reaped later."""
+        with self.condition:
+            sessions = self.take_sessions()
+        for session in sessions:
+            session.close()
+
+
+class WslExecutor:
+    """Runs WSL commands for the launcher and owns the subprocess policy.
+
+    Shell commands go through a bounded worker pool to a backend, by default
+    persistent WslShellSessions. Read-only queries submitted with
+    coalesce=True share an identical one already in flight instead of running
+    twice, and latency is tracked per command. The
+    backend is any object with run(command, user, timeout) that returns a
+    CompletedProcess, so a fake can stand in on Linux.
+    """
+    def __init__(self, backend=None, max_workers=4, window=200):
+        self.backend = backend if backend is not None else WslSessionBackend()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wsl")
+        self.window = window
+        self.lock = threading.Lock()
+        self.in_flight = {}  # (user, command) -> Future shared by identical callers
+        self.command_stats = {}  # label -> runs, coalesced, errors and recent latencies
+
+    def submit(self, command, user="dwemer", timeout=None, label=None, coalesce=False):
+        """Queue a bash command; returns a Future for its CompletedProcess."""
+        label = label or _command_label(command)
+        key = (user, command) if coalesce else None
+        with self.lock:
+            future = self.in_flight.get(key) if key else None
+            if future is not None:
+                self.stats_for(label)["coalesced"] += 1
+                return future
+            future = self.pool.submit(self.execute, key, command, user, timeout, label)
+            if key:
+                # Registered under the lock, so execute() cannot remove it before it exists
+                self.in_flight[key] = future
+        return future
+
+    def run(self, command, user="dwemer", timeout=None, label=None, coalesce=False):
+        """Run a bash command and wait for it. Raises TimeoutExpired like subprocess.run."""
+        return self.submit(command, user, timeout, label, coalesce).result()
+
+    def execute(self, key, command, user, timeout, label):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = self.backend.run(command, user=user, timeout=timeout)
+            failed = result.returncode != 0
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self.lock:
+                if key:
+                    self.in_flight.pop(key, None)
+                stats = self.stats_for(label)
+                stats["runs"] += 1
+                stats["errors"] += failed
+                stats["latency_ms"].append(elapsed_ms)
+
+    def run_process(self, args, label=None, **kwargs):
+        """subprocess.run for a one-off wsl.exe (or other) command, without a console window."""
+        start = time.perf_counter()
+        try:
+            return subprocess.run(args, **{**hidden_window_kwargs(), **kwargs})
+        finally:
+            with self.lock:
+                stats = self.stats_for(label or _command_label(" ".join(args)))
+                stats["runs"] += 1
+                stats["latency_ms"].append((time.perf_counter() - start) * 1000)
+
+    def popen(self, args, **kwargs):
+        """subprocess.Popen for long-running commands whose output is streamed, without a console window."""
+        return subprocess.Popen(args, **{**hidden_window_kwargs(), **kwargs})
+
+    def stats_for(self, label):
+        stats = self.command_stats.get(label)
+        if stats is None:
+            stats = {"runs": 0, "coalesced": 0, "errors": 0, "latency_ms": deque(maxlen=self.window)}
+            self.command_stats[label] = stats
+        return stats
+
+    def stats(self):
+        with self.lock:
+            return {
+                label: {
+                    "runs": stats["runs"],
+                    "coalesced": stats["coalesced"],
+                    "errors": stats["errors"],
+                    "latency_ms": _latency_percentiles(stats["latency_ms"]),
+                }
+                for label, stats in self.command_stats.items()
+            }
+
+    def close_sessions(self):
+        """Close idle shells (e.g. before the distro is stopped); they restart on the next command."""
+        close = getattr(self.backend, "close", None)
+        if close:
+            close()
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        self.close_sessions()
+
+
+def _command_label(command, limit=80):
+    """Single-line prefix of a command, used as its latency stats key."""
+    label = " ".join(command.split())
+    return label if len(label) <= limit else label[:limit - 3] + "..."
+
+
+# Prints "<inode>:<mtime>:<size> <base64 contents>" for a file, "<key> =" when the
+# key matches the one the caller already has cached, or "-" when it is missing.
+WSL_FILE_READ_FUNCTION = r"""
+wsl_file() {
+    local key
+    key=$(stat -c '%i:%.9Y:%s' -- "$1" 2>/dev/null) || { echo -; return; }
+    if [ "$key" = "$2" ]; then echo "$key ="; return; fi
+    printf '%s ' "$key"
+    base64 -w0 -- "$1" 2>/dev/null
+    echo
+}
+"""
+
+
+class WslFileCache:
+    """Reads small text files inside the distro through a WslExecutor.
+
+    Replaces opening them over the \\\\wsl$ share, which is slow when cold and
+    starts the distro if it is stopped. Contents are cached by inode, mtime
+    and size: every read is one stat round trip for all requested paths, and
+    only files that changed are sent back.
+    """
+    def __init__(self, executor, user="dwemer", timeout=60):
+        self.executor = executor
+        self.user = user
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = {}  # path -> (stat key, text)
+
+    def read(self, *paths):
+        """Return {path: text or None} for all paths in one WSL query; None means missing or unreadable."""
+        script = self.read_script(paths)
+        result = self.executor.run(script, user=self.user, timeout=self.timeout, label="file cache read", coalesce=True)
+        return self.parse_read(paths, result.stdout.splitlines() if result.returncode == 0 else [])
+
+    def read_script(self, paths):
+        """Bash that prints one line per path for parse_read(), for folding file reads into a larger query."""
+        with self.lock:
+            known = {path: self.entries[path][0] for path in paths if path in self.entries}
+        return WSL_FILE_READ_FUNCTION + "\n".join(
+            f"wsl_file {shlex.quote(path)} {shlex.quote(known.get(path, '-'))}" for path in paths
+        ) + "\n"
+
+    def parse_read(self, paths, lines):
+        """{path: text or None} from the lines read_script() printed, updating the cache."""
+        if len(lines) != len(paths):
+            return {path: None for path in paths}
+
+        texts = {}
+        with self.lock:
+            for path, line in zip(paths, lines):
+                key, _, data = line.strip().partition(" ")
+                if key == "-":
+                    self.entries.pop(path, None)
+                    texts[path] = None
+                elif data == "=" and path in self.entries:
+                    texts[path] = self.entries[path][1]
+                else:
+                    try:
+                        text = base64.b64decode(data).decode("utf-8", errors="replace")
+                    except ValueError:
+                        texts[path] = None
+                        continue
+                    self.entries[path] = (key, text)
+                    texts[path] = text
+        return texts
+
+    def read_text(self, path):
+        return self.read(path)[path]
+
+    def read_first(self, *paths):
+        """Stripped contents of the first path that exists and is not blank, or None."""
+        return self.first_text(self.read(*paths), paths)
+
+    @staticmethod
+    def first_text(texts, paths):
+        for path in paths:
+            text = (texts.get(path) or "").replace("\r", "").strip()
+            if text:
+                return text
+        return None
+
+
+class StartupScheduler:
+    """Runs startup stages on worker threads as soon as the stages they depend on finish.
+
+    A stage is a name, a callable and the names of the stages it runs after.
+    A stage that raises still counts as finished, so one failed lookup does
+    not hold back the rest. Start and duration are recorded per stage, in ms
+    since origin, along with named marks such as the first painted frame.
+    on_complete(scheduler) is called from a worker once every stage is done.
+    """
+    def __init__(self, max_workers=4, origin=None, on_complete=None):
+        self.max_workers = max_workers
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.on_complete = on_complete
+        self.lock = threading.Lock()
+        self.stages = {}  # name -> func, after, and timing filled in as it runs
+        self.marks = {}  # name -> ms since origin
+        self.pool = None
+
+    def add(self, name, func, after=()):
+        self.stages[name] = {
+            "func": func,
+            "after": tuple(after),
+            "submitted": False,
+            "done": False,
+            "thread": None,
+            "started_ms": None,
+            "duration_ms": None,
+            "error": None,
+        }
+
+    def start(self):
+        self.check_order()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup")
+        with self.lock:
+            ready = self.take_ready()
+        for name in ready:
+            self.pool.submit(self.run_stage, name)
+
+    def check_order(self):
+        """Raise ValueError for unknown dependencies or cycles, which would leave stages waiting forever."""
+        resolved = set()
+        remaining = dict(self.stages)
+        while remaining:
+            for name, stage in remaining.items():
+                unknown = [dep for dep in stage["after"] if dep not in self.stages]
+                if unknown:
+                    raise ValueError(f"Startup stage {name} depends on unknown stage {unknown[0]}")
+            runnable = [name for name, stage in remaining.items() if resolved.issuperset(stage["after"])]
+            if not runnable:
+                raise ValueError(f"Startup stages have a dependency cycle: {', '.join(sorted(remaining))}")
+            for name in runnable:
+                resolved.add(name)
+                del remaining[name]
+
+    def take_ready(self):
+        """Names of stages whose dependencies are done, marked as submitted. Caller holds the lock."""
+        ready = []
+        for name, stage in self.stages.items():
+            if not stage["submitted"] and all(self.stages[dep]["done"] for dep in stage["after"]):
+                stage["submitted"] = True
+                ready.append(name)
+        return ready
+
+    def run_stage(self, name):
+        stage = self.stages[name]
+        stage["thread"] = threading.current_thread()
+        start = time.perf_counter()
+        stage["started_ms"] = round((start - self.origin) * 1000, 1)
+        try:
+            stage["func"]()
+        except Exception as e:
+            stage["error"] = str(e)
+        finally:
+            stage["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            with self.lock:
+                stage["done"] = True
+                ready = self.take_ready()
+                finished = all(other["done"] for other in self.stages.values())
+            for next_name in ready:
+                self.pool.submit(self.run_stage, next_name)
+            if finished:
+                self.pool.shutdown(wait=False)
+                if self.on_complete:
+                    self.on_complete(self)
+
+    def mark(self, name):
+        """Record a point in time (ms since origin), e.g. "first_frame"."""
+        self.marks[name] = round((time.perf_counter() - self.origin) * 1000, 1)
+        return self.marks[name]
+
+    def timings(self):
+        return {
+            "marks": dict(self.marks),
+            "stages": {
+                name: {
+                    "after": list(stage["after"]),
+                    "started_ms": stage["started_ms"],
+                    "duration_ms": stage["duration_ms"],
+                    "error": stage["error"],
+                }
+                for name, stage in self.stages.items()
+            },
+        }
+
+
+class StartupTrace:
+    """Wall-clock spans for --profile-startup, written as a Chrome trace.
+
+    Times are perf_counter() values and are stored relative to origin. With
+    enabled=False nothing is recorded, so call sites can wrap work in span()
+    without checking whether profiling is on. The file loads in
+    chrome://tracing or Perfetto. Its otherData section also lists each
+    phase's duration in ms for reading without a viewer.
+    """
+    def __init__(self, origin=None, enabled=True):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.spans = []  # (name, category, start, end, thread ident, thread name)
+        self.marks = []  # (name, time)
+
+    @contextlib.contextmanager
+    def span(self, name, category="startup"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), category)
+
+    def add(self, name, start, end, category="startup", thread=None):
+        if not self.enabled:
+            return
+        thread = thread or threading.current_thread()
+        with self.lock:
+            self.spans.append((name, category, start, end, thread.ident, thread.name))
+
+    def mark(self, name, when=None):
+        if self.enabled:
+            with self.lock:
+                self.marks.append((name, when if when is not None else time.perf_counter()))
+
+    def add_scheduler(self, scheduler):
+        """Add a StartupScheduler's stages (as spans on their worker threads) and marks."""
+        for name, stage in scheduler.stages.items():
+            if stage["started_ms"] is None or stage["duration_ms"] is None:
+                continue
+            start = scheduler.origin + stage["started_ms"] / 1000
+            self.add(name, start, start + stage["duration_ms"] / 1000, "stage", stage["thread"])
+        for name, ms in scheduler.marks.items():
+            self.mark(name, scheduler.origin + ms / 1000)
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span[2])
+            marks = list(self.marks)
+        events = []
+        thread_names = {}
+        for name, category, start, end, ident, thread_name in spans:
+            thread_names[ident] = thread_name
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6),
+                "dur": round((end - start) * 1e6),
+                "pid": pid,
+                "tid": ident,
+            })
+        for name, when in marks:
+            events.append({"name": name, "ph": "i", "s": "g", "ts": round((when - self.origin) * 1e6), "pid": pid, "tid": 0})
+        for ident, thread_name in thread_names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": thread_name}})
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "phases_ms": {name: round((end - start) * 1000, 1) for name, _, start, end, _, _ in spans},
+                "marks_ms": {name: round((when - self.origin) * 1000, 1) for name, when in marks},
+            },
+        }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file, indent=1)
+
+
+class ConsoleLogger:
+    """append_output() sink for headless mode. Errors go to stderr."""
+    def __init__(self, stream=None, error_stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.error_stream = error_stream if error_stream is not None else sys.stderr
+        self.lock = threading.Lock()
+
+    def append_output(self, text, tag=None):
+        stream = self.error_stream if tag == "red" else self.stream
+        if stream is None:  # pythonw / --windowed builds have no console
+            return
+        with self.lock:
+            stream.write(text)
+            stream.flush()
+
+
+class ProxyServices:
+    """Proxy routes, discovery server and WSL IP tracking, independent of any UI.
+
+    options is the namespace produced by add_service_arguments(). lookup_ip is the
+    IP provider polled by the WslIpWatcher; by default it is a fixed --wsl-ip or
+    `hostname -I` inside the distro. on_distro_missing(message) lets the launcher
+    show a dialog when the distro is not installed. wsl is the launcher's
+    WslExecutor, whose per-command stats are added to /metrics.
+    """
+    def __init__(self, logger, options, lookup_ip=None, on_distro_missing=None, wsl=None):
+        self.logger = logger
+        self.wsl = wsl
+        self.engine = options.proxy_engine if options.proxy_engine in PROXY_ENGINES else "thread"
+        self.http_pool = options.proxy_http_pool # HTTP-aware mode with pooled keep-alive upstream sockets
+        self.route_names = [name.strip().lower() for name in options.proxy_routes.split(",") if name.strip()]
+        self.max_connections = options.proxy_max_connections
+        self.accept_queue_depth = options.proxy_accept_queue
+        self.idle_timeout = options.proxy_idle_timeout # Seconds a proxied connection may sit idle
+        self.total_timeout = options.proxy_total_timeout # Upper bound on a proxied connection's lifetime
+        self.on_distro_missing = on_distro_missing
+        self.fixed_ip = getattr(options, "wsl_ip", None) if lookup_ip is None else None # --wsl-ip skips WSL lookups
+        if lookup_ip is None:
+            lookup_ip = (lambda: self.fixed_ip) if self.fixed_ip else self.lookup_wsl_ip
+
+        self.metrics = ProxyMetrics() # Served as JSON on the discovery server's /metrics
+        self.wsl_ip = None # Last IP published by ip_watcher
+        self.last_ip_error = None # Repeated lookup failures during backoff are only reported once
+        self.ip_watcher = WslIpWatcher(lookup_ip)
+        self.ip_watcher.subscribe(self.on_ip_changed)
+        # Connects read the IP pushed by ip_watcher; a miss waits for the watcher instead of spawning wsl.exe
+        self.resolver = WslTargetResolver(lambda: self.get_wsl_ip())
+        self.ip_watcher.subscribe(self.resolver.update)
+        self.upstream_pool = None
+        self.proxy_servers = {} # Route name -> running proxy listener
+        self.discovery_server = None
+        self.server_ready = None # Set by the launcher from the start_env ready marker; None when not known (headless)
+        # Reads the watcher's in-memory IP, so probing never spawns wsl.exe
+        self.health_probe = HealthProbe(lambda: self.ip_watcher.current_ip)
+
+    def start(self, trace=None):
+        """Start the IP watcher (idle until the distro starts or a client asks), proxies and discovery.
+
+        trace is an optional StartupTrace that times the proxy and discovery binds.
+        """
+        trace = trace or StartupTrace(enabled=False)
+        self.ip_watcher.start()
+        if self.fixed_ip:
+            # The lookup is a constant, so publish it before discovery opens instead of answering 503 first
+            self.ip_watcher.wait_for_ip(timeout=1)
+        self.health_probe.start()
+        with trace.span("proxy_bind", "services"):
+            self.start_proxies()
+        with trace.span("discovery_bind", "services"):
+            self.start_discovery()
+
+    def start_proxies(self):
+        proxy_kwargs = {
+            "on_connect_error": self.on_proxy_connect_error,
+            "metrics": self.metrics,
+            "max_connections": self.max_connections,
+            "accept_queue_depth": self.accept_queue_depth,
+            "idle_timeout": self.idle_timeout,
+            "total_timeout": self.total_timeout,
+        }
+        if self.http_pool:
+            if self.engine == "thread":
+                # Keyed by target address, so one pool serves every route
+                self.upstream_pool = UpstreamConnectionPool()
+                proxy_kwargs["upstream_pool"] = self.upstream_pool
+            else:
+                self.logger.append_output("Proxy: HTTP keep-alive pool requires the thread engine; using raw relay.\n", "yellow")
+        proxy_class = PROXY_ENGINES[self.engine]
+
+        for route in PROXY_ROUTES:
+            if route["name"] not in self.route_names:
+                continue
+            try:
+                def target_addr_func(target_port=route["target_port"]):
+                    return self.resolver.resolve(target_port)
+                proxy = proxy_class(
+                    ('127.0.0.1', route["listen_port"]),
+                    target_addr_func,
+                    self.logger,
+                    route_name=route["display_name"],
+                    **proxy_kwargs
+                )
+                proxy.start()
+                self.proxy_servers[route["name"]] = proxy
+            except Exception as e:
+                self.logger.append_output(f"Proxy Error ({route['display_name']}): {e}\n", "red")
+
+    def start_discovery(self):
+        try:
+            # Discovery workers must not block on a lookup; with no IP they answer 503 + Retry-After
+            self.discovery_server = DiscoveryHTTPServer(
+                self.logger, self.ip_watcher.peek_ip, self.metrics_snapshot,
+                health_provider=self.health_snapshot, proxy_addrs=self.proxy_addrs(),
+            )
+            self.discovery_server.update_wsl_ip(self.ip_watcher.current_ip)
+            self.ip_watcher.subscribe(self.discovery_server.update_wsl_ip)
+            self.discovery_server.start()
+        except Exception as e:
+            self.logger.append_output(f"Discovery Service Error: {e}\n", "red")
+            self.discovery_server = None
+
+    def proxy_addrs(self):
+        """Map each discovery game to the listener of the running route that targets its port."""
+        listen_addrs = {}
+        for route in PROXY_ROUTES:
+            proxy = self.proxy_servers.get(route["name"])
+            if proxy:
+                listen_addrs[route["target_port"]] = f"{proxy.listen_addr[0]}:{proxy.listen_addr[1]}"
+        return {
+            game: listen_addrs[target_port]
+            for game, target_port in DISCOVERY_GAME_PORTS.items()
+            if target_port in listen_addrs
+        }
+
+    def stop_proxies(self):
+        for proxy in self.proxy_servers.values():
+            proxy.shutdown()
+        self.proxy_servers = {}
+
+    def stop(self):
+        self.stop_proxies()
+        if self.discovery_server:
+            self.discovery_server.shutdown()
+            self.discovery_server = None
+        self.health_probe.stop()
+        self.ip_watcher.stop()
+
+    def on_proxy_connect_error(self):
+        # The cached IP may belong to a previous distro boot; have the watcher re-verify it
+        self.ip_watcher.request_refresh()
+        self.resolver.invalidate()
+
+    def get_wsl_ip(self, force_refresh=False, timeout=10):
+        """Get the IP address of the WSL instance from the background watcher.
+
+        force_refresh asks the watcher to re-verify the IP and waits for the result.
+        """
+        if force_refresh:
+            self.ip_watcher.request_refresh()
+        return self.ip_watcher.wait_for_ip(timeout)
+
+    def on_ip_changed(self, new_ip, old_ip):
+        """WslIpWatcher subscriber. Only logs if IP changes."""
+        self.wsl_ip = new_ip
+        if new_ip:
+            self.logger.append_output(f"DwemerDistro WSL IP: {new_ip}\n")
+
+    def report_ip_error(self, message, tag=None):
+        """Log a lookup error unless it repeats the previous one; returns True if it was logged."""
+        if message == self.last_ip_error:
+            return False
+        self.last_ip_error = message
+        self.logger.append_output(message, tag)
+        return True
+
+    def lookup_wsl_ip(self):
+        """Default IP provider: `hostname -I` in the distro. Called by ip_watcher only."""
+        try:
+            wsl_ip = query_wsl_ip()
+            if not wsl_ip:
+                self.report_ip_error("Failed to parse WSL IP address from output.\n")
+                return None
+            self.last_ip_error = None
+            return wsl_ip
+        except FileNotFoundError:
+            self.report_ip_error("Error: 'wsl' command not found. Is WSL installed and in PATH?\n")
+        except subprocess.CalledProcessError as e:
+            # Check if the error is specifically because the distro is not found
+            distro_not_found_msg = "no distribution with the supplied name"
+            if e.stderr and distro_not_found_msg in e.stderr.lower():
+                error_message = (
+                    "Dwemer Distro is not installed! Download it here:\n"
+                    "https://www.nexusmods.com/skyrimspecialedition/mods/126330?tab=files"
+                )
+                if self.report_ip_error(f"Error: {error_message}\n", "red") and self.on_distro_missing:
+                    self.on_distro_missing(error_message)
+            else:
+                self.report_ip_error(f"Error checking WSL IP: {e}\nStderr: {e.stderr}\n")
+        except Exception as e:
+            self.report_ip_error(f"An unexpected error occurred while getting WSL IP: {e}\n")
+        return None
+
+    def set_server_ready(self, ready):
+        self.server_ready = ready
+        if ready:
+            self.ip_watcher.resume()
+
+    def health_snapshot(self):
+        """(ready, payload) for /health and /ready, built from cached state only."""
+        probe = self.health_probe.snapshot()
+        wsl_ip = self.ip_watcher.current_ip
+        ready = bool(wsl_ip) and self.health_probe.ready() and self.server_ready is not False
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "wsl_ip": wsl_ip,
+            "server_ready": self.server_ready,
+            "proxy": {
+                "engine": self.engine,
+                "routes": {name: proxy.is_alive() for name, proxy in self.proxy_servers.items()},
+                "active_connections": len(self.metrics.active),
+            },
+            "discovery": self.discovery_server is not None,
+            "probe": probe,
+        }
+
+    def metrics_snapshot(self):
+        """Proxy traffic metrics plus resolver and upstream pool counters."""
+        return {
+            "engine": self.engine,
+            "limits": {
+                "max_connections": self.max_connections,
+                "accept_queue_depth": self.accept_queue_depth,
+                "idle_timeout": self.idle_timeout,
+                "total_timeout": self.total_timeout,
+            },
+            "proxy": self.metrics.snapshot(),
+            "resolver": self.resolver.stats(),
+            "wsl_ip_watcher": self.ip_watcher.stats(),
+            "upstream_pool": self.upstream_pool.stats() if self.upstream_pool else None,
+            "wsl_commands": self.wsl.stats() if self.wsl else None,
+        }
+
+
+def add_service_arguments(parser):
+    """Proxy and discovery options shared by the launcher window and headless mode."""
+    parser.add_argument(
+        "--proxy-engine",
+        choices=sorted(PROXY_ENGINES),
+        default="thread",
+        help="Relay engine for the 127.0.0.1 proxies (default: thread)"
+    )
+    parser.add_argument(
+        "--proxy-http-pool",
+        action="store_true",
+        help="Parse HTTP in the proxy and reuse warm keep-alive sockets to HerikaServer (thread engine only)"
+    )
+    parser.add_argument(
+        "--proxy-routes",
+        default=",".join(route["name"] for route in PROXY_ROUTES),
+        help="Comma-separated proxy routes to serve: herika (7513 -> 8081), stobe (7514 -> 8083)"
+    )
+    parser.add_argument(
+        "--proxy-max-connections",
+        type=int,
+        default=32,
+        help="Connections the proxy relays at once; more wait in the accept queue (default: 32)"
+    )
+    parser.add_argument(
+        "--proxy-accept-queue",
+        type=int,
+        default=64,
+        help="Accepted connections allowed to wait for a slot before new ones get a 503 (default: 64)"
+    )
+    parser.add_argument(
+        "--proxy-idle-timeout",
+        type=float,
+        default=60,
+        help="Seconds a proxied connection may sit without traffic (default: 60)"
+    )
+    parser.add_argument(
+        "--proxy-total-timeout",
+        type=float,
+        default=600,
+        help="Maximum lifetime of a proxied connection in seconds, 0 to disable (default: 600)"
+    )
+    parser.add_argument(
+        "--wsl-ip",
+        help="Forward to this IP instead of asking WSL for the distro's address"
+    )
+
+
+def run_headless(options, logger=None):
+    """Run the proxies and discovery server until interrupted."""
+    logger = logger or ConsoleLogger()
+    services = ProxyServices(logger, options)
+    services.start()
+    logger.append_output("Headless mode: proxy and discovery services running, press Ctrl+C to stop.\n")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        services.stop()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dwemer Distro proxy and discovery services (no launcher window)")
+    add_service_arguments(parser)
+    return run_headless(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())